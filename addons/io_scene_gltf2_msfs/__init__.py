@@ -326,6 +326,22 @@ class ExportGLTF2_Base:
         default=False,
     )
 
+    export_extract_memory_budget: IntProperty(
+        name="Memory Budget (MB)",
+        description="Approximate memory used to extract the vertices of a mesh. "
+        "Very large meshes are extracted in chunks of materials to stay within it. "
+        "0 extracts every mesh at once",
+        default=0,
+        min=0,
+    )
+
+    export_geometry_cache: BoolProperty(
+        name="Geometry Cache",
+        description="Store the extracted meshes in a folder next to the exported file, "
+        "and reuse them for meshes that didn't change in the next export",
+        default=False,
+    )
+
     export_cameras: BoolProperty(
         name="Cameras", description="Export cameras", default=False
     )
@@ -471,6 +487,22 @@ class ExportGLTF2_Base:
         default=True,
     )
 
+    optimize_vertex_cache: BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Reorder triangles and vertices for the GPU vertex cache. "
+        "Increases export time",
+        default=False,
+    )
+
+    asobo_packing_threads: IntProperty(
+        name="Packing Threads",
+        description="Number of threads used to pack meshes for the simulator. "
+        "0 uses all available cores. The output is the same for any number of threads",
+        default=1,
+        min=0,
+        max=64,
+    )
+
     will_save_settings: BoolProperty(
         name="Remember Export Settings",
         description="Store glTF export settings in the Blender project",
@@ -588,6 +620,10 @@ class ExportGLTF2_Base:
         export_settings["gltf_tangents"] = self.export_tangents and self.export_normals
         export_settings["gltf_loose_edges"] = self.use_mesh_edges
         export_settings["gltf_loose_points"] = self.use_mesh_vertices
+        export_settings["gltf_extract_memory_budget"] = (
+            self.export_extract_memory_budget * 1024 * 1024
+        )
+        export_settings["gltf_geometry_cache"] = self.export_geometry_cache
 
         if self.is_draco_available:
             export_settings[
@@ -671,13 +707,14 @@ class ExportGLTF2_Base:
         export_settings["gltf_lights"] = self.export_lights
         export_settings["gltf_displacement"] = self.export_displacement
 
-        export_settings["gltf_binary"] = bytearray()
         export_settings["gltf_binaryfilename"] = (
             os.path.splitext(os.path.basename(self.filepath))[0] + ".bin"
         )
 
         # MSFS
         export_settings["emulate_asobo_optimization"] = self.emulate_asobo_optimization
+        export_settings["optimize_vertex_cache"] = self.optimize_vertex_cache
+        export_settings["asobo_packing_threads"] = self.asobo_packing_threads
 
         user_extensions = []
         pre_export_callbacks = []
@@ -834,6 +871,8 @@ class GLTFMSFS_PT_export_geometry(bpy.types.Panel):
         col = layout.column()
         col.prop(operator, "use_mesh_edges")
         col.prop(operator, "use_mesh_vertices")
+        layout.prop(operator, "export_extract_memory_budget")
+        layout.prop(operator, "export_geometry_cache")
 
         layout.prop(operator, "export_materials")
         col = layout.column()
@@ -1065,6 +1104,11 @@ class GLTFMSFS_PT_export_msfs(bpy.types.Panel):
 
         layout.prop(operator, "emulate_asobo_optimization")
 
+        col = layout.column()
+        col.active = operator.emulate_asobo_optimization
+        col.prop(operator, "optimize_vertex_cache")
+        col.prop(operator, "asobo_packing_threads")
+
 
 class ExportMSFSGLTF2(bpy.types.Operator, ExportGLTF2_Base, ExportHelper):
     """Export scene as glTF 2.0 file for MSFS"""
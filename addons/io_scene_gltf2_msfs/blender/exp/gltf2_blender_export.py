@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
 import time
 
 import bpy
@@ -20,11 +21,15 @@ import traceback
 from io_scene_gltf2_msfs.blender.com import gltf2_blender_json
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_export_keys
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather
+from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather_cache
 from io_scene_gltf2_msfs.blender.exp.gltf2_blender_gltf2_exporter import GlTF2Exporter
 from io_scene_gltf2_msfs.io.com.gltf2_io_debug import print_console, print_newline
 from io_scene_gltf2_msfs.io.exp import gltf2_io_export
 from io_scene_gltf2_msfs.io.exp import gltf2_io_draco_compression_extension
 from io_scene_gltf2_msfs.io.exp import gltf2_io_asobo_buffer_views
+from io_scene_gltf2_msfs.io.exp import gltf2_io_vertex_cache_optimization
+from io_scene_gltf2_msfs.io.exp.gltf2_io_bounding_box import BoundingBox
+from io_scene_gltf2_msfs.io.exp.gltf2_io_geometry_cache import GeometryCache
 from io_scene_gltf2_msfs.io.exp.gltf2_io_user_extensions import export_user_extensions
 
 
@@ -62,28 +67,33 @@ def save(context, export_settings):
 
 
 def __export(export_settings):
-    exporter = GlTF2Exporter(export_settings)
-    __gather_gltf(exporter, export_settings)
-    buffer = __create_buffer(exporter, export_settings)
-    exporter.finalize_images()
+    gltf2_blender_gather_cache.start_export_cache()
+    try:
+        exporter = GlTF2Exporter(export_settings)
+        __gather_gltf(exporter, export_settings)
+        buffer = __create_buffer(exporter, export_settings)
+        exporter.finalize_images()
 
-    export_user_extensions("gather_gltf_hook", export_settings, exporter.glTF)
-    exporter.traverse_extensions()
+        export_user_extensions("gather_gltf_hook", export_settings, exporter.glTF)
+        exporter.traverse_extensions()
+    finally:
+        gltf2_blender_gather_cache.end_export_cache()
 
-    # now that addons possibly add some fields in json, we can fix in needed
-    json = __fix_json(exporter.glTF.to_dict())
+    # None values and empty collections are removed while the JSON is written
+    json = exporter.glTF.to_dict()
 
     return json, buffer
 
 
 def __gather_gltf(exporter, export_settings):
     if export_settings["emulate_asobo_optimization"]:
-        export_settings["bounding_box_max_x"] = 0
-        export_settings["bounding_box_max_y"] = 0
-        export_settings["bounding_box_max_z"] = 0
-        export_settings["bounding_box_min_x"] = 0
-        export_settings["bounding_box_min_y"] = 0
-        export_settings["bounding_box_min_z"] = 0
+        export_settings["bounding_box"] = BoundingBox()
+
+    export_settings["geometry_cache"] = None
+    if export_settings["gltf_geometry_cache"]:
+        export_settings["geometry_cache"] = GeometryCache(
+            os.path.splitext(export_settings["gltf_filepath"])[0] + ".geometry_cache"
+        )
 
     export_settings["extensionsUsed"] = []
     export_settings["extensionsRequired"] = []
@@ -92,6 +102,17 @@ def __gather_gltf(exporter, export_settings):
         export_settings
     )
 
+    if export_settings["geometry_cache"] is not None:
+        # Remove the meshes that aren't part of this export anymore
+        export_settings["geometry_cache"].prune()
+        print_console(
+            "INFO",
+            "Geometry cache: {} hits, {} misses".format(
+                export_settings["geometry_cache"].hits,
+                export_settings["geometry_cache"].misses,
+            ),
+        )
+
     for extensionUsed in export_settings["extensionsUsed"]:
         exporter.add_extension_used(extensionUsed)
 
@@ -107,8 +128,15 @@ def __gather_gltf(exporter, export_settings):
     if export_settings[
         "emulate_asobo_optimization"
     ]:  # Prepare the primitives and buffer views for the simulator
+        if export_settings["optimize_vertex_cache"]:
+            gltf2_io_vertex_cache_optimization.optimize_scene_primitives(
+                scenes, export_settings
+            )
+
         buffer_views = gltf2_io_asobo_buffer_views.AsoboBufferViews()
-        buffer_views.traverse_scenes(scenes)
+        buffer_views.traverse_scenes(
+            scenes, max_workers=export_settings["asobo_packing_threads"] or None
+        )
         exporter.add_asobo_buffer_views(buffer_views.BufferViews)
 
     for idx, scene in enumerate(scenes):
@@ -118,21 +146,10 @@ def __gather_gltf(exporter, export_settings):
 
     # Add asobo extensions
     if export_settings["emulate_asobo_optimization"]:
-        bounding_box_max = [
-            export_settings["bounding_box_max_x"],
-            export_settings["bounding_box_max_y"],
-            export_settings["bounding_box_max_z"],
-        ]
-        bounding_box_min = [
-            export_settings["bounding_box_min_x"],
-            export_settings["bounding_box_min_y"],
-            export_settings["bounding_box_min_z"],
-        ]
-
         extensions = {
             "ASOBO_asset_optimized": {
-                "BoundingBoxMax": bounding_box_max,
-                "BoundingBoxMin": bounding_box_min,
+                "BoundingBoxMax": export_settings["bounding_box"].max,
+                "BoundingBoxMin": export_settings["bounding_box"].min,
                 "MajorVersion": 4,
                 "MinorVersion": 2,
             },
@@ -143,57 +160,14 @@ def __gather_gltf(exporter, export_settings):
 
 
 def __create_buffer(exporter, export_settings):
-    buffer = bytes()
     if export_settings[gltf2_blender_export_keys.FORMAT] == "GLB":
-        buffer = exporter.finalize_buffer(
-            export_settings[gltf2_blender_export_keys.FILE_DIRECTORY], is_glb=True
-        )
+        return exporter.finalize_buffer(is_glb=True)
+    elif export_settings[gltf2_blender_export_keys.FORMAT] == "GLTF_EMBEDDED":
+        return exporter.finalize_buffer()
     else:
-        if export_settings[gltf2_blender_export_keys.FORMAT] == "GLTF_EMBEDDED":
-            exporter.finalize_buffer(
-                export_settings[gltf2_blender_export_keys.FILE_DIRECTORY]
-            )
-        else:
-            exporter.finalize_buffer(
-                export_settings[gltf2_blender_export_keys.FILE_DIRECTORY],
-                export_settings[gltf2_blender_export_keys.BINARY_FILENAME],
-            )
-
-    return buffer
-
-
-def __fix_json(obj):
-    # TODO: move to custom JSON encoder
-    fixed = obj
-    if isinstance(obj, dict):
-        fixed = {}
-        for key, value in obj.items():
-            if not __should_include_json_value(key, value):
-                continue
-            fixed[key] = __fix_json(value)
-    elif isinstance(obj, list):
-        fixed = []
-        for value in obj:
-            fixed.append(__fix_json(value))
-    elif isinstance(obj, float):
-        # force floats to int, if they are integers (prevent INTEGER_WRITTEN_AS_FLOAT validator warnings)
-        if int(obj) == obj:
-            return int(obj)
-    return fixed
-
-
-def __should_include_json_value(key, value):
-    allowed_empty_collections = ["KHR_materials_unlit"]
-
-    if value is None:
-        return False
-    elif __is_empty_collection(value) and key not in allowed_empty_collections:
-        return False
-    return True
-
-
-def __is_empty_collection(value):
-    return (isinstance(value, dict) or isinstance(value, list)) and len(value) == 0
+        return exporter.finalize_buffer(
+            export_settings[gltf2_blender_export_keys.BINARY_FILENAME]
+        )
 
 
 def __write_file(json, buffer, export_settings):
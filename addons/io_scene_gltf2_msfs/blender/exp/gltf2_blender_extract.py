@@ -13,10 +13,10 @@
 # limitations under the License.
 
 import numpy as np
-from mathutils import Vector
 
 from . import gltf2_blender_export_keys
 from ...io.com.gltf2_io_debug import print_console
+from ...io.com.gltf2_io_dedup import unique_records
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather_skins
 
 
@@ -28,8 +28,13 @@ def extract_primitives(
     blender_vertex_groups,
     modifiers,
     export_settings,
+    vertex_group_elements=None,
 ):
-    """Extract primitives from a mesh."""
+    """
+    Extract primitives from a mesh.
+
+    :param vertex_group_elements: the result of read_vertex_groups, if the vertex groups of the mesh were already read
+    """
     print_console("INFO", "Extracting primitive: " + blender_mesh.name)
 
     use_normals = export_settings[gltf2_blender_export_keys.NORMALS]
@@ -131,12 +136,14 @@ def extract_primitives(
 
     # Fetch vert positions and bone data (joint,weights)
 
-    locs, morph_locs = __get_positions(
+    locs = __get_positions(
         blender_mesh, key_blocks, armature, blender_object, export_settings
     )
     if skin:
-        vert_bones, num_joint_sets = __get_bone_data(
-            blender_mesh, skin, blender_vertex_groups
+        if vertex_group_elements is None:
+            vertex_group_elements = read_vertex_groups(blender_mesh)
+        bone_data, num_joint_sets, vertex_weight_counts = __get_bone_data(
+            skin, blender_vertex_groups, vertex_group_elements
         )
 
     # In Blender there is both per-vert data, like position, and also per-loop
@@ -150,20 +157,31 @@ def extract_primitives(
     #
     # Each unique dot will become one unique glTF vert.
 
+    # Optimized meshes store their loop data in the final quantized component types: bytes for normals and tangents, and float16 for tex
+    # coords. Their vertex colors aren't stored at all, since __gather_colors in gltf2_blender_gather_primitive_attributes replaces them with
+    # constants (15360 or -1). This keeps the dots small, and vertices that only differ before quantization are merged.
+    quantize = export_settings["emulate_asobo_optimization"]
+    normal_dtype = np.int8 if quantize else np.float32
+    tex_coord_dtype = np.float16 if quantize else np.float32
+    store_colors = not quantize
+
     # List all fields the dot struct needs.
     dot_fields = [("vertex_index", np.uint32)]
     if use_normals:
-        dot_fields += [("nx", np.float32), ("ny", np.float32), ("nz", np.float32)]
+        dot_fields += [("nx", normal_dtype), ("ny", normal_dtype), ("nz", normal_dtype)]
     if use_tangents:
         dot_fields += [
-            ("tx", np.float32),
-            ("ty", np.float32),
-            ("tz", np.float32),
-            ("tw", np.float32),
+            ("tx", normal_dtype),
+            ("ty", normal_dtype),
+            ("tz", normal_dtype),
+            ("tw", normal_dtype),
         ]
     for uv_i in range(tex_coord_max):
-        dot_fields += [("uv%dx" % uv_i, np.float32), ("uv%dy" % uv_i, np.float32)]
-    for col_i in range(color_max):
+        dot_fields += [
+            ("uv%dx" % uv_i, tex_coord_dtype),
+            ("uv%dy" % uv_i, tex_coord_dtype),
+        ]
+    for col_i in range(color_max if store_colors else 0):
         dot_fields += [
             ("color%dr" % col_i, np.float32),
             ("color%dg" % col_i, np.float32),
@@ -178,56 +196,6 @@ def extract_primitives(
                 ("morph%dnz" % morph_i, np.float32),
             ]
 
-    dots = np.empty(len(blender_mesh.loops), dtype=np.dtype(dot_fields))
-
-    vidxs = np.empty(len(blender_mesh.loops))
-    blender_mesh.loops.foreach_get("vertex_index", vidxs)
-    dots["vertex_index"] = vidxs
-    del vidxs
-
-    if use_normals:
-        kbs = key_blocks if use_morph_normals else []
-        normals, morph_normals = __get_normals(
-            blender_mesh, kbs, armature, blender_object, export_settings
-        )
-        dots["nx"] = normals[:, 0]
-        dots["ny"] = normals[:, 1]
-        dots["nz"] = normals[:, 2]
-        del normals
-        for morph_i, ns in enumerate(morph_normals):
-            dots["morph%dnx" % morph_i] = ns[:, 0]
-            dots["morph%dny" % morph_i] = ns[:, 1]
-            dots["morph%dnz" % morph_i] = ns[:, 2]
-        del morph_normals
-
-    if use_tangents:
-        tangents = __get_tangents(
-            blender_mesh, armature, blender_object, export_settings
-        )
-        dots["tx"] = tangents[:, 0]
-        dots["ty"] = tangents[:, 1]
-        dots["tz"] = tangents[:, 2]
-        del tangents
-        signs = __get_bitangent_signs(
-            blender_mesh, armature, blender_object, export_settings
-        )
-        dots["tw"] = signs
-        del signs
-
-    for uv_i in range(tex_coord_max):
-        uvs = __get_uvs(blender_mesh, uv_i, export_settings)
-        dots["uv%dx" % uv_i] = uvs[:, 0]
-        dots["uv%dy" % uv_i] = uvs[:, 1]
-        del uvs
-
-    for col_i in range(color_max):
-        colors = __get_colors(blender_mesh, col_i, export_settings)
-        dots["color%dr" % col_i] = colors[:, 0]
-        dots["color%dg" % col_i] = colors[:, 1]
-        dots["color%db" % col_i] = colors[:, 2]
-        dots["color%da" % col_i] = colors[:, 3]
-        del colors
-
     # Calculate triangles and sort them into primitives.
 
     blender_mesh.calc_loop_triangles()
@@ -247,26 +215,47 @@ def extract_primitives(
 
         tri_material_idxs = np.empty(len(blender_mesh.loop_triangles), dtype=np.uint32)
         blender_mesh.loop_triangles.foreach_get("material_index", tri_material_idxs)
-        loop_material_idxs = np.repeat(
-            tri_material_idxs, 3
-        )  # material index for every loop
-        unique_material_idxs = np.unique(tri_material_idxs)
-        del tri_material_idxs
-
-        for material_idx in unique_material_idxs:
-            prim_indices[material_idx] = loop_indices[
-                loop_material_idxs == material_idx
+
+        # Sort the triangles by material index once, then slice out the range of every material. The sort is stable, so the triangles of a
+        # material stay in their original order.
+        tri_order = np.argsort(tri_material_idxs, kind="stable")
+        sorted_material_idxs = tri_material_idxs[tri_order]
+        sorted_loop_indices = loop_indices.reshape(-1, 3)[tri_order].reshape(-1)
+        del tri_material_idxs, tri_order
+
+        bucket_starts = np.flatnonzero(
+            np.diff(sorted_material_idxs, prepend=np.int64(-1)) != 0
+        )
+        bucket_ends = np.append(bucket_starts[1:], len(sorted_material_idxs))
+        for start, end in zip(bucket_starts, bucket_ends):
+            prim_indices[sorted_material_idxs[start]] = sorted_loop_indices[
+                3 * start : 3 * end
             ]
 
     # Create all the primitives.
 
     primitives = []
-
-    for material_idx, dot_indices in prim_indices.items():
-        # Extract just dots used by this primitive, deduplicate them, and
-        # calculate indices into this deduplicated list.
-        prim_dots = dots[dot_indices]
-        prim_dots, indices = np.unique(prim_dots, return_inverse=True)
+    primitive_blender_idxs = (
+        []
+    )  # The Blender vertex of every glTF vert, used to add the morph targets later
+
+    bucket_dots = __iter_bucket_dots(
+        blender_mesh,
+        prim_indices,
+        np.dtype(dot_fields),
+        key_blocks if use_morph_normals else [],
+        armature,
+        blender_object,
+        use_normals,
+        use_tangents,
+        tex_coord_max,
+        color_max if store_colors else 0,
+        export_settings,
+    )
+    for material_idx, prim_dots in bucket_dots:
+        # Deduplicate the dots used by this primitive, and calculate indices
+        # into this deduplicated list.
+        prim_dots, indices = unique_records(prim_dots)
 
         if len(prim_dots) == 0:
             continue
@@ -278,30 +267,11 @@ def extract_primitives(
         blender_idxs = prim_dots["vertex_index"]
 
         attributes["POSITION"] = locs[blender_idxs]
+        primitive_blender_idxs.append(blender_idxs)
 
         vertex_type = None
         if export_settings["emulate_asobo_optimization"]:
-            for loc in locs[blender_idxs]:
-                location = Vector((loc[0], loc[1], loc[2]))
-
-                export_settings["bounding_box_max_x"] = max(
-                    location.x, export_settings["bounding_box_max_x"]
-                )
-                export_settings["bounding_box_max_y"] = max(
-                    location.y, export_settings["bounding_box_max_y"]
-                )
-                export_settings["bounding_box_max_z"] = max(
-                    location.z, export_settings["bounding_box_max_z"]
-                )
-                export_settings["bounding_box_min_x"] = min(
-                    location.x, export_settings["bounding_box_min_x"]
-                )
-                export_settings["bounding_box_min_y"] = min(
-                    location.y, export_settings["bounding_box_min_y"]
-                )
-                export_settings["bounding_box_min_z"] = min(
-                    location.z, export_settings["bounding_box_min_z"]
-                )
+            export_settings["bounding_box"].add(attributes["POSITION"])
 
             # Determine vertex type of the primitive
             # There are 3 possible vertex types - VTX, BLEND1, and BLEND4.
@@ -313,24 +283,16 @@ def extract_primitives(
             if (
                 armature
             ):  # Some meshes can have weights without being skinned, so we need to make sure that the mesh is skinned before assigning BLENDX vertex types
-                for vi in blender_idxs:  # this function needs refactoring
-                    vertex = blender_mesh.vertices[vi]
-                    weight_count = len(
-                        list(filter(lambda x: x.weight > 0, vertex.groups))
-                    )
-                    if weight_count > 1:
-                        vertex_type = "BLEND4"
-                        break
-                    elif weight_count == 1 and vertex_type == "VTX":
-                        vertex_type = "BLEND1"
-
-        for morph_i, vs in enumerate(morph_locs):
-            attributes["MORPH_POSITION_%d" % morph_i] = vs[blender_idxs]
+                weight_count = np.amax(vertex_weight_counts[blender_idxs])
+                if weight_count > 1:
+                    vertex_type = "BLEND4"
+                elif weight_count == 1:
+                    vertex_type = "BLEND1"
 
         if use_normals:
             if export_settings["emulate_asobo_optimization"]:
                 # Asobo optimized meshes use a VEC4 for normals. The 4th value is there due to bit packing and alignment
-                normals = np.empty((len(prim_dots), 4), dtype=np.float32)
+                normals = np.empty((len(prim_dots), 4), dtype=normal_dtype)
                 normals[:, 0] = prim_dots["nx"]
                 normals[:, 1] = prim_dots["ny"]
                 normals[:, 2] = prim_dots["nz"]
@@ -343,7 +305,7 @@ def extract_primitives(
             attributes["NORMAL"] = normals
 
         if use_tangents:
-            tangents = np.empty((len(prim_dots), 4), dtype=np.float32)
+            tangents = np.empty((len(prim_dots), 4), dtype=normal_dtype)
             tangents[:, 0] = prim_dots["tx"]
             tangents[:, 1] = prim_dots["ty"]
             tangents[:, 2] = prim_dots["tz"]
@@ -364,44 +326,38 @@ def extract_primitives(
                     )
 
         for tex_coord_i in range(tex_coord_max):
-            uvs = np.empty((len(prim_dots), 2), dtype=np.float32)
+            uvs = np.empty((len(prim_dots), 2), dtype=tex_coord_dtype)
             uvs[:, 0] = prim_dots["uv%dx" % tex_coord_i]
             uvs[:, 1] = prim_dots["uv%dy" % tex_coord_i]
             attributes["TEXCOORD_%d" % tex_coord_i] = uvs
 
         for color_i in range(color_max):
-            colors = np.empty((len(prim_dots), 4), dtype=np.float32)
-            colors[:, 0] = prim_dots["color%dr" % color_i]
-            colors[:, 1] = prim_dots["color%dg" % color_i]
-            colors[:, 2] = prim_dots["color%db" % color_i]
-            colors[:, 3] = prim_dots["color%da" % color_i]
+            if store_colors:
+                colors = np.empty((len(prim_dots), 4), dtype=np.float32)
+                colors[:, 0] = prim_dots["color%dr" % color_i]
+                colors[:, 1] = prim_dots["color%dg" % color_i]
+                colors[:, 2] = prim_dots["color%db" % color_i]
+                colors[:, 3] = prim_dots["color%da" % color_i]
+            else:
+                # The constant colors of optimized meshes are filled in when gathering the attributes
+                colors = np.broadcast_to(np.float32(1.0), (len(prim_dots), 4))
             attributes["COLOR_%d" % color_i] = colors
 
         if skin:
-            joints = [[] for _ in range(num_joint_sets)]
-            weights = [[] for _ in range(num_joint_sets)]
-
-            for vi in blender_idxs:
-                bones = vert_bones[vi]
-                for j in range(0, 4 * num_joint_sets):
-                    if j < len(bones):
-                        joint, weight = bones[j]
-                    else:
-                        joint, weight = 0, 0.0
-                    joints[j // 4].append(joint)
-                    if (
-                        vertex_type == "BLEND1"
-                    ):  # BLEND1 meshes dont have more than one bone influence, so we only need one weight per bone
-                        if (
-                            j % 4 == 0
-                        ):  # Only add weight if we are at the start of a joint set
-                            weights[j].append(weight)
-                    else:
-                        weights[j // 4].append(weight)
-
-            for i, (js, ws) in enumerate(zip(joints, weights)):
-                attributes["JOINTS_%d" % i] = js
-                attributes["WEIGHTS_%d" % i] = ws
+            joints, weights = __gather_bone_data(
+                bone_data, num_joint_sets, blender_idxs
+            )
+
+            for i in range(num_joint_sets):
+                attributes["JOINTS_%d" % i] = joints[:, 4 * i : 4 * i + 4].reshape(-1)
+                if (
+                    vertex_type == "BLEND1"
+                ):  # BLEND1 meshes dont have more than one bone influence, so we only need one weight per bone
+                    attributes["WEIGHTS_%d" % i] = weights[:, 4 * i]
+                else:
+                    attributes["WEIGHTS_%d" % i] = weights[
+                        :, 4 * i : 4 * i + 4
+                    ].reshape(-1)
 
         if export_settings["emulate_asobo_optimization"]:
             # We add 3 extra properties if emulating asobo optimization
@@ -429,38 +385,32 @@ def extract_primitives(
         and not export_settings["emulate_asobo_optimization"]
     ):  # MSFS only supports primitive mode 4 (triangles)
         # Find loose edges
-        loose_edges = [e for e in blender_mesh.edges if e.is_loose]
-        blender_idxs = [vi for e in loose_edges for vi in e.vertices]
+        edge_vidxs = __get_edge_vertices(blender_mesh)
+        is_loose = np.empty(len(blender_mesh.edges), dtype=bool)
+        blender_mesh.edges.foreach_get("is_loose", is_loose)
+        blender_idxs = edge_vidxs[is_loose].reshape(-1)
 
-        if blender_idxs:
+        if len(blender_idxs) > 0:
             # Export one glTF vert per unique Blender vert in a loose edge
-            blender_idxs = np.array(blender_idxs, dtype=np.uint32)
             blender_idxs, indices = np.unique(blender_idxs, return_inverse=True)
 
             attributes = {}
 
             attributes["POSITION"] = locs[blender_idxs]
-
-            for morph_i, vs in enumerate(morph_locs):
-                attributes["MORPH_POSITION_%d" % morph_i] = vs[blender_idxs]
+            primitive_blender_idxs.append(blender_idxs)
 
             if skin:
-                joints = [[] for _ in range(num_joint_sets)]
-                weights = [[] for _ in range(num_joint_sets)]
-
-                for vi in blender_idxs:
-                    bones = vert_bones[vi]
-                    for j in range(0, 4 * num_joint_sets):
-                        if j < len(bones):
-                            joint, weight = bones[j]
-                        else:
-                            joint, weight = 0, 0.0
-                        joints[j // 4].append(joint)
-                        weights[j // 4].append(weight)
-
-                for i, (js, ws) in enumerate(zip(joints, weights)):
-                    attributes["JOINTS_%d" % i] = js
-                    attributes["WEIGHTS_%d" % i] = ws
+                joints, weights = __gather_bone_data(
+                    bone_data, num_joint_sets, blender_idxs
+                )
+
+                for i in range(num_joint_sets):
+                    attributes["JOINTS_%d" % i] = joints[:, 4 * i : 4 * i + 4].reshape(
+                        -1
+                    )
+                    attributes["WEIGHTS_%d" % i] = weights[
+                        :, 4 * i : 4 * i + 4
+                    ].reshape(-1)
 
             primitives.append(
                 {
@@ -476,38 +426,30 @@ def extract_primitives(
         and not export_settings["emulate_asobo_optimization"]
     ):  # MSFS only supports primitive mode 4 (triangles)
         # Find loose points
-        verts_in_edge = set(vi for e in blender_mesh.edges for vi in e.vertices)
-        blender_idxs = [
-            vi for vi, _ in enumerate(blender_mesh.vertices) if vi not in verts_in_edge
-        ]
-
-        if blender_idxs:
-            blender_idxs = np.array(blender_idxs, dtype=np.uint32)
+        edge_counts = np.bincount(
+            __get_edge_vertices(blender_mesh).reshape(-1),
+            minlength=len(blender_mesh.vertices),
+        )
+        blender_idxs = np.flatnonzero(edge_counts == 0).astype(np.uint32)
 
+        if len(blender_idxs) > 0:
             attributes = {}
 
             attributes["POSITION"] = locs[blender_idxs]
-
-            for morph_i, vs in enumerate(morph_locs):
-                attributes["MORPH_POSITION_%d" % morph_i] = vs[blender_idxs]
+            primitive_blender_idxs.append(blender_idxs)
 
             if skin:
-                joints = [[] for _ in range(num_joint_sets)]
-                weights = [[] for _ in range(num_joint_sets)]
-
-                for vi in blender_idxs:
-                    bones = vert_bones[vi]
-                    for j in range(0, 4 * num_joint_sets):
-                        if j < len(bones):
-                            joint, weight = bones[j]
-                        else:
-                            joint, weight = 0, 0.0
-                        joints[j // 4].append(joint)
-                        weights[j // 4].append(weight)
-
-                for i, (js, ws) in enumerate(zip(joints, weights)):
-                    attributes["JOINTS_%d" % i] = js
-                    attributes["WEIGHTS_%d" % i] = ws
+                joints, weights = __gather_bone_data(
+                    bone_data, num_joint_sets, blender_idxs
+                )
+
+                for i in range(num_joint_sets):
+                    attributes["JOINTS_%d" % i] = joints[:, 4 * i : 4 * i + 4].reshape(
+                        -1
+                    )
+                    attributes["WEIGHTS_%d" % i] = weights[
+                        :, 4 * i : 4 * i + 4
+                    ].reshape(-1)
 
             primitives.append(
                 {
@@ -517,26 +459,231 @@ def extract_primitives(
                 }
             )
 
+    # Add the morph targets one shape key at a time, so only one of them is in memory
+    for morph_i, key_block in enumerate(key_blocks):
+        vs = __get_morph_positions(
+            blender_mesh, key_block, locs, armature, blender_object, export_settings
+        )
+        for primitive, blender_idxs in zip(primitives, primitive_blender_idxs):
+            primitive["attributes"]["MORPH_POSITION_%d" % morph_i] = vs[blender_idxs]
+        del vs
+
     print_console("INFO", "Primitives created: %d" % len(primitives))
 
     return primitives
 
 
+def __get_edge_vertices(blender_mesh):
+    """Get the indices of the two vertices of each edge."""
+    edge_vidxs = np.empty(len(blender_mesh.edges) * 2, dtype=np.uint32)
+    blender_mesh.edges.foreach_get("vertices", edge_vidxs)
+    return edge_vidxs.reshape(len(blender_mesh.edges), 2)
+
+
+def __iter_bucket_dots(
+    blender_mesh,
+    prim_indices,
+    dot_dtype,
+    morph_key_blocks,
+    armature,
+    blender_object,
+    use_normals,
+    use_tangents,
+    tex_coord_max,
+    color_max,
+    export_settings,
+):
+    """
+    Yields (material index, dots) for every material bucket, with the dots of all loops of its triangles.
+
+    If the dots of the whole mesh don't fit in the memory budget, the buckets are grouped into chunks that do. Only the dots of the loops used
+    by one chunk are kept in memory at a time.
+    """
+    chunks = __chunk_buckets(
+        prim_indices,
+        len(blender_mesh.loops),
+        dot_dtype.itemsize,
+        export_settings["gltf_extract_memory_budget"],
+    )
+    if len(chunks) > 1:
+        print_console(
+            "INFO",
+            "Extracting %d chunks to stay within the memory budget" % len(chunks),
+        )
+
+    for chunk in chunks:
+        loop_idxs = None  # All loops
+        if len(chunks) > 1:
+            loop_idxs = np.unique(
+                np.concatenate([prim_indices[material_idx] for material_idx in chunk])
+            )
+
+        dots = __get_dots(
+            blender_mesh,
+            dot_dtype,
+            loop_idxs,
+            morph_key_blocks,
+            armature,
+            blender_object,
+            use_normals,
+            use_tangents,
+            tex_coord_max,
+            color_max,
+            export_settings,
+        )
+
+        for material_idx in chunk:
+            dot_indices = prim_indices[material_idx]
+            if loop_idxs is not None:
+                dot_indices = np.searchsorted(loop_idxs, dot_indices)
+            yield material_idx, dots[dot_indices]
+
+        del dots
+
+
+def __chunk_buckets(prim_indices, loop_count, dot_size, memory_budget):
+    """
+    Groups the material buckets into chunks, in order, so the dots of every chunk fit in memory_budget bytes. A bucket that doesn't fit on its
+    own gets a chunk of its own.
+
+    :return: a list of lists of material indices. If the dots of all loops fit in the budget, or the budget is 0, this is a single chunk
+    """
+    if memory_budget <= 0 or loop_count * dot_size <= memory_budget:
+        return [list(prim_indices)]
+
+    chunks = []
+    chunk_size = 0
+    for material_idx, dot_indices in prim_indices.items():
+        bucket_size = (
+            len(dot_indices) * dot_size
+        )  # Upper bound, loops can be shared by triangles
+        if not chunks or chunk_size + bucket_size > memory_budget:
+            chunks.append([])
+            chunk_size = 0
+        chunks[-1].append(material_idx)
+        chunk_size += bucket_size
+    return chunks
+
+
+def __get_dots(
+    blender_mesh,
+    dot_dtype,
+    loop_idxs,
+    morph_key_blocks,
+    armature,
+    blender_object,
+    use_normals,
+    use_tangents,
+    tex_coord_max,
+    color_max,
+    export_settings,
+):
+    """
+    Get the dots of the loops in loop_idxs, or of all loops if loop_idxs is None. Every attribute is copied into the dots and released before
+    the next one is fetched.
+    """
+    quantize = export_settings["emulate_asobo_optimization"]
+    selection = slice(None) if loop_idxs is None else loop_idxs
+    dots = np.empty(
+        len(blender_mesh.loops) if loop_idxs is None else len(loop_idxs),
+        dtype=dot_dtype,
+    )
+
+    vidxs = np.empty(len(blender_mesh.loops))
+    blender_mesh.loops.foreach_get("vertex_index", vidxs)
+    dots["vertex_index"] = vidxs[selection]
+    del vidxs
+
+    if use_normals:
+        normals = __get_normals(
+            blender_mesh, morph_key_blocks, armature, blender_object, export_settings
+        )
+        for morph_i, key_block in enumerate(morph_key_blocks):
+            ns = __get_morph_normals(
+                blender_mesh,
+                key_block,
+                normals,
+                armature,
+                blender_object,
+                export_settings,
+            )
+            dots["morph%dnx" % morph_i] = ns[selection, 0]
+            dots["morph%dny" % morph_i] = ns[selection, 1]
+            dots["morph%dnz" % morph_i] = ns[selection, 2]
+            del ns
+        if quantize:
+            normals = __quantize_normals(normals)
+        dots["nx"] = normals[selection, 0]
+        dots["ny"] = normals[selection, 1]
+        dots["nz"] = normals[selection, 2]
+        del normals
+
+    if use_tangents:
+        tangents = __get_tangents(
+            blender_mesh, armature, blender_object, export_settings
+        )
+        if quantize:
+            tangents = __quantize_normals(tangents)
+        dots["tx"] = tangents[selection, 0]
+        dots["ty"] = tangents[selection, 1]
+        dots["tz"] = tangents[selection, 2]
+        del tangents
+        signs = __get_bitangent_signs(
+            blender_mesh, armature, blender_object, export_settings
+        )
+        if quantize:
+            signs = __quantize_normals(signs)
+        dots["tw"] = signs[selection]
+        del signs
+
+    for uv_i in range(tex_coord_max):
+        uvs = __get_uvs(blender_mesh, uv_i, export_settings)
+        dots["uv%dx" % uv_i] = uvs[selection, 0]
+        dots["uv%dy" % uv_i] = uvs[selection, 1]
+        del uvs
+
+    for col_i in range(color_max):
+        colors = __get_colors(blender_mesh, col_i, export_settings)
+        dots["color%dr" % col_i] = colors[selection, 0]
+        dots["color%dg" % col_i] = colors[selection, 1]
+        dots["color%db" % col_i] = colors[selection, 2]
+        dots["color%da" % col_i] = colors[selection, 3]
+        del colors
+
+    return dots
+
+
 def __get_positions(
     blender_mesh, key_blocks, armature, blender_object, export_settings
 ):
+    """Get the position of each vertex. If there are shape keys, this is the position in their reference key."""
     locs = np.empty(len(blender_mesh.vertices) * 3, dtype=np.float32)
     source = key_blocks[0].relative_key.data if key_blocks else blender_mesh.vertices
     source.foreach_get("co", locs)
     locs = locs.reshape(len(blender_mesh.vertices), 3)
 
-    morph_locs = []
-    for key_block in key_blocks:
-        vs = np.empty(len(blender_mesh.vertices) * 3, dtype=np.float32)
-        key_block.data.foreach_get("co", vs)
-        vs = vs.reshape(len(blender_mesh.vertices), 3)
-        morph_locs.append(vs)
+    __transform_positions(locs, armature, blender_object, export_settings)
 
+    return locs
+
+
+def __get_morph_positions(
+    blender_mesh, key_block, locs, armature, blender_object, export_settings
+):
+    """Get the position deltas of a shape key, relative to the positions from __get_positions."""
+    vs = np.empty(len(blender_mesh.vertices) * 3, dtype=np.float32)
+    key_block.data.foreach_get("co", vs)
+    vs = vs.reshape(len(blender_mesh.vertices), 3)
+
+    __transform_positions(vs, armature, blender_object, export_settings)
+
+    # glTF stores deltas in morph targets
+    vs -= locs
+
+    return vs
+
+
+def __transform_positions(locs, armature, blender_object, export_settings):
     # Transform for skinning
     if armature and blender_object:
         apply_matrix = armature.matrix_world.inverted() @ blender_object.matrix_world
@@ -544,23 +691,13 @@ def __get_positions(
 
         loc_transform = blender_object.matrix_world
         locs[:] = __apply_mat_to_all(loc_transform, locs)
-        for vs in morph_locs:
-            vs[:] = __apply_mat_to_all(loc_transform, vs)
-
-    # glTF stores deltas in morph targets
-    for vs in morph_locs:
-        vs -= locs
 
     if export_settings[gltf2_blender_export_keys.YUP]:
         __zup2yup(locs)
-        for vs in morph_locs:
-            __zup2yup(vs)
-
-    return locs, morph_locs
 
 
 def __get_normals(blender_mesh, key_blocks, armature, blender_object, export_settings):
-    """Get normal for each loop."""
+    """Get normal for each loop. If there are shape keys, this is the normal in their reference key."""
     if key_blocks:
         normals = key_blocks[0].relative_key.normals_split_get()
         normals = np.array(normals, dtype=np.float32)
@@ -571,12 +708,27 @@ def __get_normals(blender_mesh, key_blocks, armature, blender_object, export_set
 
     normals = normals.reshape(len(blender_mesh.loops), 3)
 
-    morph_normals = []
-    for key_block in key_blocks:
-        ns = np.array(key_block.normals_split_get(), dtype=np.float32)
-        ns = ns.reshape(len(blender_mesh.loops), 3)
-        morph_normals.append(ns)
+    __transform_normals(normals, armature, blender_object, export_settings)
+
+    return normals
+
+
+def __get_morph_normals(
+    blender_mesh, key_block, normals, armature, blender_object, export_settings
+):
+    """Get the normal deltas of a shape key for each loop, relative to the normals from __get_normals."""
+    ns = np.array(key_block.normals_split_get(), dtype=np.float32)
+    ns = ns.reshape(len(blender_mesh.loops), 3)
+
+    __transform_normals(ns, armature, blender_object, export_settings)
+
+    # glTF stores deltas in morph targets
+    ns -= normals
+
+    return ns
+
 
+def __transform_normals(normals, armature, blender_object, export_settings):
     # Transform for skinning
     if armature and blender_object:
         apply_matrix = armature.matrix_world.inverted() @ blender_object.matrix_world
@@ -585,26 +737,14 @@ def __get_normals(blender_mesh, key_blocks, armature, blender_object, export_set
 
         normals[:] = __apply_mat_to_all(normal_transform, normals)
         __normalize_vecs(normals)
-        for ns in morph_normals:
-            ns[:] = __apply_mat_to_all(normal_transform, ns)
-            __normalize_vecs(ns)
 
-    for ns in [normals, *morph_normals]:
-        # Replace zero normals with the unit UP vector.
-        # Seems to happen sometimes with degenerate tris?
-        is_zero = ~ns.any(axis=1)
-        ns[is_zero, 2] = 1
-
-    # glTF stores deltas in morph targets
-    for ns in morph_normals:
-        ns -= normals
+    # Replace zero normals with the unit UP vector.
+    # Seems to happen sometimes with degenerate tris?
+    is_zero = ~normals.any(axis=1)
+    normals[is_zero, 2] = 1
 
     if export_settings[gltf2_blender_export_keys.YUP]:
         __zup2yup(normals)
-        for ns in morph_normals:
-            __zup2yup(ns)
-
-    return normals, morph_normals
 
 
 def __get_tangents(blender_mesh, armature, blender_object, export_settings):
@@ -645,22 +785,59 @@ def __get_bitangent_signs(blender_mesh, armature, blender_object, export_setting
     return signs
 
 
+def __quantize_normals(vectors):
+    # Normalized floats to the signed bytes used by optimized meshes
+    vectors = vectors * 127
+    return vectors.astype(np.int8)
+
+
 def __calc_morph_tangents(normals, morph_normal_deltas, tangents):
     # TODO: check if this works
-    morph_tangent_deltas = np.empty((len(normals), 3), dtype=np.float32)
-
-    for i in range(len(normals)):
-        n = Vector(normals[i])
-        morph_n = n + Vector(morph_normal_deltas[i])  # convert back to non-delta
-        t = Vector(tangents[i, :3])
+    # Rotates every tangent by the rotation from the morphed normal to the base normal (like mathutils' rotation_difference), for all vertices
+    # at once using Rodrigues' rotation formula
+    n = normals.astype(np.float64)
+    morph_n = n + morph_normal_deltas  # convert back to non-delta
+    __normalize_vecs(n)
+    __normalize_vecs(morph_n)
+    t = tangents[:, :3].astype(np.float64)
+
+    axes = np.cross(morph_n, n)
+    sines = np.linalg.norm(axes, axis=1)
+    cosines = np.einsum("ij,ij->i", morph_n, n)
+
+    # Degenerate cases are handled like mathutils: parallel normals don't rotate, and opposite normals rotate half a turn around an axis
+    # orthogonal to the morphed normal
+    is_rotated = sines > np.finfo(np.float32).eps
+    np.divide(axes, sines[:, None], out=axes, where=is_rotated[:, None])
+    is_opposite = ~is_rotated & (cosines <= 0)
+    ortho_axes = __ortho_vecs(morph_n[is_opposite])
+    __normalize_vecs(ortho_axes)
+    axes[is_opposite] = ortho_axes
+    is_opposite &= np.any(axes != 0, axis=1)  # zero normals have no orthogonal axis
+    sines[is_opposite] = 0
+    cosines[is_opposite] = -1
+    is_identity = ~is_rotated & ~is_opposite
+    sines[is_identity] = 0
+    cosines[is_identity] = 1
+
+    t_morph = (
+        t * cosines[:, None]
+        + np.cross(axes, t) * sines[:, None]
+        + axes * (np.einsum("ij,ij->i", axes, t) * (1 - cosines))[:, None]
+    )
 
-        rotation = morph_n.rotation_difference(n)
+    return (t_morph - t).astype(np.float32)  # back to delta
 
-        t_morph = Vector(t)
-        t_morph.rotate(rotation)
-        morph_tangent_deltas[i] = t_morph - t  # back to delta
 
-    return morph_tangent_deltas
+def __ortho_vecs(vectors):
+    # Vectors orthogonal to vectors, picked from their dominant axis like Blender's ortho_v3_v3
+    ortho = np.empty_like(vectors)
+    x, y, z = vectors[:, 0], vectors[:, 1], vectors[:, 2]
+    dominant_axes = np.argmax(np.abs(vectors), axis=1)
+    ortho[:] = np.stack((z, z, -x - y), axis=1)
+    ortho[dominant_axes == 0] = np.stack((-y - z, x, x), axis=1)[dominant_axes == 0]
+    ortho[dominant_axes == 1] = np.stack((y, -x - z, y), axis=1)[dominant_axes == 1]
+    return ortho
 
 
 def __get_uvs(blender_mesh, uv_i, export_settings):
@@ -713,39 +890,113 @@ def __get_colors(blender_mesh, color_i, export_settings):
     return colors
 
 
-def __get_bone_data(blender_mesh, skin, blender_vertex_groups):
+def read_vertex_groups(blender_mesh):
+    """
+    Reads the vertex group elements of all vertices.
+
+    :return (group_counts, groups, weights): the amount of vertex group elements of every vertex, and the group and weight of every element
+    in vertex order
+    """
+    # Vertex groups can't be read with foreach_get, so this is the only loop over the vertices
+    vertex_groups = [vertex.groups for vertex in blender_mesh.vertices]
+    group_counts = np.fromiter(
+        map(len, vertex_groups), dtype=np.int64, count=len(vertex_groups)
+    )
+    group_elements = [
+        group_element for groups in vertex_groups for group_element in groups
+    ]
+    groups = np.fromiter(
+        (group_element.group for group_element in group_elements),
+        dtype=np.int64,
+        count=len(group_elements),
+    )
+    weights = np.fromiter(
+        (group_element.weight for group_element in group_elements),
+        dtype=np.float64,
+        count=len(group_elements),
+    )
+    return group_counts, groups, weights
+
+
+def __get_bone_data(skin, blender_vertex_groups, vertex_group_elements):
+    """
+    Gathers the bone influences of all vertices in CSR form. The influences of vertex i are joints[offsets[i] : offsets[i + 1]] and
+    weights[offsets[i] : offsets[i + 1]], sorted by descending weight.
+
+    :return ((offsets, joints, weights), num_joint_sets, vertex_weight_counts): the influences, the amount of joint sets needed to store them
+    (1 set = 4 influences), and the amount of vertex groups with a weight greater than 0 of every vertex
+    """
     joint_name_to_index = {joint.name: index for index, joint in enumerate(skin.joints)}
-    group_to_joint = [joint_name_to_index.get(g.name) for g in blender_vertex_groups]
-
-    # List of (joint, weight) pairs for each vert
-    vert_bones = []
-    max_num_influences = 0
-
-    for vertex in blender_mesh.vertices:
-        bones = []
-        if vertex.groups:
-            for group_element in vertex.groups:
-                weight = group_element.weight
-                if weight <= 0.0:
-                    continue
-                try:
-                    joint = group_to_joint[group_element.group]
-                except Exception:
-                    continue
-                if joint is None:
-                    continue
-                bones.append((joint, weight))
-        bones.sort(key=lambda x: x[1], reverse=True)
-        if not bones:
-            bones = ((0, 1.0),)  # HACK for verts with zero weight (#308)
-        vert_bones.append(bones)
-        if len(bones) > max_num_influences:
-            max_num_influences = len(bones)
+    # The last entry is used for groups that can't be mapped to a joint
+    group_to_joint = np.array(
+        [joint_name_to_index.get(g.name, -1) for g in blender_vertex_groups] + [-1],
+        dtype=np.int64,
+    )
+
+    group_counts, groups, weights = vertex_group_elements
+    vertex_count = len(group_counts)
+    vertex_idxs = np.repeat(np.arange(vertex_count), group_counts)
+
+    # Used to pick the Asobo vertex type. This counts all vertex groups, not only the ones that are joints of the skin
+    vertex_weight_counts = np.bincount(
+        vertex_idxs[weights > 0.0], minlength=vertex_count
+    )
+
+    groups = np.where((groups < 0) | (groups >= len(blender_vertex_groups)), -1, groups)
+    joints = group_to_joint[groups]
+
+    # Skip zero weights and groups that aren't joints of the skin
+    valid = (weights > 0.0) & (joints >= 0)
+    vertex_idxs = vertex_idxs[valid]
+    joints = joints[valid]
+    weights = weights[valid]
+
+    # HACK for verts with zero weight (#308)
+    unweighted_vertex_idxs = np.flatnonzero(
+        np.bincount(vertex_idxs, minlength=vertex_count) == 0
+    )
+    vertex_idxs = np.concatenate((vertex_idxs, unweighted_vertex_idxs))
+    joints = np.concatenate((joints, np.zeros(len(unweighted_vertex_idxs), np.int64)))
+    weights = np.concatenate((weights, np.ones(len(unweighted_vertex_idxs))))
+
+    # Sort by vertex, then by descending weight. lexsort is stable, so equal weights stay in vertex group order
+    order = np.lexsort((-weights, vertex_idxs))
+    joints = joints[order]
+    weights = weights[order]
+
+    influence_counts = np.bincount(vertex_idxs, minlength=vertex_count)
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(influence_counts, out=offsets[1:])
 
     # How many joint sets do we need? 1 set = 4 influences
+    max_num_influences = int(np.amax(influence_counts)) if vertex_count > 0 else 0
     num_joint_sets = (max_num_influences + 3) // 4
 
-    return vert_bones, num_joint_sets
+    return (offsets, joints, weights), num_joint_sets, vertex_weight_counts
+
+
+def __gather_bone_data(bone_data, num_joint_sets, blender_idxs):
+    """
+    Gathers the influences of the given vertices into padded arrays, with 4 * num_joint_sets influences per vertex.
+
+    :return (joints, weights): two arrays of shape (len(blender_idxs), 4 * num_joint_sets). Unused influences have joint 0 and weight 0
+    """
+    offsets, joints, weights = bone_data
+
+    starts = offsets[blender_idxs]
+    counts = offsets[blender_idxs + 1] - starts
+
+    # Row and column in the padded arrays of every influence, and its index in the CSR arrays
+    rows = np.repeat(np.arange(len(blender_idxs)), counts)
+    columns = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    influence_idxs = np.repeat(starts, counts) + columns
+
+    padded_joints = np.zeros((len(blender_idxs), 4 * num_joint_sets), dtype=np.uint32)
+    padded_weights = np.zeros((len(blender_idxs), 4 * num_joint_sets), dtype=np.float64)
+    padded_joints[rows, columns] = joints[influence_idxs]
+    padded_weights[rows, columns] = weights[influence_idxs]
+
+    return padded_joints, padded_weights
 
 
 def __zup2yup(array):
@@ -15,68 +15,106 @@
 import functools
 import bpy
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_get
+from io_scene_gltf2_msfs.io.com.gltf2_io_debug import print_console
+
+# The export the results of the cached functions belong to. Results of another generation are never reused
+g_cache_generation = 0
+g_cached_functions = []
+
+
+def start_export_cache():
+    """Start a new cache generation, so nothing gathered by a previous export is reused."""
+    global g_cache_generation
+
+    g_cache_generation += 1
+    for func in g_cached_functions:
+        __reset_cache(func)
+
+
+def end_export_cache():
+    """Print the hit rate of every cached function at PROFILE level, and free the cached results of the export."""
+    for func in g_cached_functions:
+        if func.__hits or func.__misses:
+            print_console(
+                "PROFILE",
+                "Gather cache {}.{}: {} hits, {} misses, {} entries".format(
+                    func.__module__.rsplit(".", 1)[-1],
+                    func.__name__,
+                    func.__hits,
+                    func.__misses,
+                    len(func.__cache),
+                ),
+            )
+        __reset_cache(func)
+
+
+def __reset_cache(func):
+    func.__cache = {}
+    func.__generation = g_cache_generation
+    func.__hits = 0
+    func.__misses = 0
+
+
+def __get_cache_key(value):
+    value_type = type(value)
+    if value_type in __by_name_full:
+        # Includes the library, so linked data blocks with the same name don't share results
+        return value.name_full
+    if value_type in __by_name:
+        return value.name
+    return value
+
+
+__by_name_full = frozenset(
+    [
+        bpy.types.Object,
+        bpy.types.Scene,
+        bpy.types.Material,
+        bpy.types.Action,
+        bpy.types.Mesh,
+    ]
+)
+__by_name = frozenset([bpy.types.PoseBone])
 
 
 def cached(func):
     """
     Decorate the cache gather functions results.
 
-    The gather function is only executed if its result isn't in the cache yet
+    The gather function is only executed if its result isn't in the cache yet. The cache only holds results of the current export, see
+    start_export_cache and end_export_cache
     :param func: the function to be decorated. It will have a static __cache member afterwards
     :return:
     """
+    __reset_cache(func)
+    g_cached_functions.append(func)
 
     @functools.wraps(func)
     def wrapper_cached(*args, **kwargs):
         assert (
             len(args) >= 2 and 0 <= len(kwargs) <= 1
         ), "Wrong signature for cached function"
-        cache_key_args = args
-        # make a shallow copy of the keyword arguments so that 'export_settings' can be removed
-        cache_key_kwargs = dict(kwargs)
-        if kwargs.get("export_settings"):
-            export_settings = kwargs["export_settings"]
-            # 'export_settings' should not be cached
-            del cache_key_kwargs["export_settings"]
+        # 'export_settings' should not be cached
+        if "export_settings" in kwargs:
+            cache_key_args = args
         else:
-            export_settings = args[-1]
-            cache_key_args = args[:-1]
-
-        __by_name = [
-            bpy.types.Object,
-            bpy.types.Scene,
-            bpy.types.Material,
-            bpy.types.Action,
-            bpy.types.Mesh,
-            bpy.types.PoseBone,
-        ]
+            cache_key_args = args[:-1] + tuple(kwargs.values())
 
         # we make a tuple from the function arguments so that they can be used as a key to the cache
-        cache_key = ()
-        for i in cache_key_args:
-            if type(i) in __by_name:
-                cache_key += (i.name,)
-            else:
-                cache_key += (i,)
-        for i in cache_key_kwargs.values():
-            if type(i) in __by_name:
-                cache_key += (i.name,)
-            else:
-                cache_key += (i,)
-
-        # invalidate cache if export settings have changed
-        if (
-            not hasattr(func, "__export_settings")
-            or export_settings != func.__export_settings
-        ):
-            func.__cache = {}
-            func.__export_settings = export_settings
+        cache_key = tuple(map(__get_cache_key, cache_key_args))
+
+        # invalidate cache if it was filled by another export
+        if func.__generation != g_cache_generation:
+            __reset_cache(func)
         # use or fill cache
-        if cache_key in func.__cache:
-            return func.__cache[cache_key]
+        cache = func.__cache
+        if cache_key in cache:
+            func.__hits += 1
+            return cache[cache_key]
         else:
-            result = func(*args)
-            func.__cache[cache_key] = result
+            func.__misses += 1
+            result = func(*args, **kwargs)
+            cache[cache_key] = result
             return result
 
     return wrapper_cached
@@ -63,8 +63,8 @@ def array_to_accessor(
 
     num_elems = gltf2_io_constants.DataType.num_elements(data_type)
 
-    if type(array) is not np.ndarray:
-        array = np.array(array, dtype=dtype)
+    if type(array) is not np.ndarray or array.ndim == 1:
+        array = np.asarray(array, dtype=dtype)
         array = array.reshape(len(array) // num_elems, num_elems)
 
     assert array.dtype == dtype
@@ -125,10 +125,11 @@ def __gather_normal(blender_primitive, export_settings):
         data_type = (
             gltf2_io_constants.DataType.Vec4
         )  # Asobo uses a VEC4 instead of a VEC3 for normals
-        normal *= 127
-        normal = normal.astype(
-            gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(component_type)
-        )  # Convert the numpy array data type to bytes
+        if normal.dtype.kind == "f":  # Extracted normals are usually already bytes
+            normal *= 127
+            normal = normal.astype(
+                gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(component_type)
+            )  # Convert the numpy array data type to bytes
     return {
         "NORMAL": array_to_accessor(
             normal,
@@ -156,10 +157,11 @@ def __gather_tangent(blender_primitive, export_settings):
         component_type = (
             gltf2_io_constants.ComponentType.Byte
         )  # Asobo uses bytes instead of floats
-        tangent *= 127
-        tangent = tangent.astype(
-            gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(component_type)
-        )  # Convert the numpy array data type to bytes
+        if tangent.dtype.kind == "f":  # Extracted tangents are usually already bytes
+            tangent *= 127
+            tangent = tangent.astype(
+                gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(component_type)
+            )  # Convert the numpy array data type to bytes
     return {
         "TANGENT": array_to_accessor(
             tangent,
@@ -188,7 +190,8 @@ def __gather_texcoord(blender_primitive, export_settings):
                 tex_coord = tex_coord.astype(
                     gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(
                         component_type
-                    )
+                    ),
+                    copy=False,
                 )  # Convert the numpy array data type to shorts
             attributes[tex_coord_id] = array_to_accessor(
                 tex_coord,
@@ -223,7 +226,7 @@ def __gather_colors(
             component_type = gltf2_io_constants.ComponentType.UnsignedShort
             if export_settings["emulate_asobo_optimization"]:
                 if blender_primitive["VertexType"] == "VTX":
-                    colors[:] = 15360
+                    color = 15360
                     component_type = (
                         gltf2_io_constants.ComponentType.UnsignedShort
                     )  # Unskinned meshes use unsigned shorts
@@ -231,12 +234,14 @@ def __gather_colors(
                     component_type = (
                         gltf2_io_constants.ComponentType.Byte
                     )  # Skinned meshes use bytes
-                    colors[:] = -1
-                colors = colors.astype(
-                    gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(
+                    color = -1
+                colors = np.full(
+                    colors.shape,
+                    color,
+                    dtype=gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(
                         component_type
-                    )
-                )  # Convert the numpy array data type
+                    ),
+                )  # Optimized meshes use a constant color
             else:
                 # Convert to normalized ushorts
                 colors *= 65535
@@ -273,9 +278,10 @@ def __gather_skins(blender_primitive, export_settings):
         bone_set_index = 0
         joint_id = "JOINTS_" + str(bone_set_index)
         weight_id = "WEIGHTS_" + str(bone_set_index)
-        while blender_primitive["attributes"].get(joint_id) and blender_primitive[
-            "attributes"
-        ].get(weight_id):
+        while (
+            blender_primitive["attributes"].get(joint_id) is not None
+            and blender_primitive["attributes"].get(weight_id) is not None
+        ):
             if bone_set_index >= 1:
                 if not export_settings["gltf_all_vertex_influences"]:
                     gltf2_io_debug.print_console(
@@ -288,7 +294,7 @@ def __gather_skins(blender_primitive, export_settings):
             # joints
             internal_joint = blender_primitive["attributes"][joint_id]
             component_type = gltf2_io_constants.ComponentType.UnsignedShort
-            if max(internal_joint) < 256:
+            if np.amax(internal_joint) < 256:
                 component_type = gltf2_io_constants.ComponentType.UnsignedByte
             joint = array_to_accessor(
                 internal_joint,
@@ -311,18 +317,20 @@ def __gather_skins(blender_primitive, export_settings):
             if export_settings["emulate_asobo_optimization"]:
                 vertex_type = blender_primitive["VertexType"]
 
-            if (
+            normalize = (
                 not export_settings["gltf_all_vertex_influences"]
                 and not vertex_type == "BLEND1"
-            ):
-                for idx in range(0, len(internal_weight), 4):
-                    weight_slice = internal_weight[idx : idx + 4]
-                    total = sum(weight_slice)
-                    if total > 0:
-                        factor = 1.0 / total
-                        internal_weight[idx : idx + 4] = [
-                            w * factor for w in weight_slice
-                        ]
+            )
+            if vertex_type != "BLEND1":
+                internal_weight = np.asarray(internal_weight, dtype=np.float64).reshape(
+                    -1, 4
+                )
+            if normalize:
+                totals = np.sum(internal_weight, axis=1, keepdims=True)
+                factors = np.divide(
+                    1.0, totals, out=np.ones_like(totals), where=totals > 0
+                )
+                internal_weight = internal_weight * factors
 
             weight_component_type = gltf2_io_constants.ComponentType.Float
             weight_data_type = gltf2_io_constants.DataType.Vec4
@@ -335,7 +343,11 @@ def __gather_skins(blender_primitive, export_settings):
                     weight_component_type = (
                         gltf2_io_constants.ComponentType.UnsignedShort
                     )  # BLEND4 primitives use unsigned shorts instead of floats
-                    internal_weight = [round(x * 65535) for x in internal_weight]
+                    internal_weight = __quantize_weights(
+                        internal_weight, exact_sum=normalize
+                    )
+
+            internal_weight = internal_weight.reshape(-1)
 
             weight = array_to_accessor(
                 internal_weight,
@@ -354,3 +366,35 @@ def __gather_skins(blender_primitive, export_settings):
             joint_id = "JOINTS_" + str(bone_set_index)
             weight_id = "WEIGHTS_" + str(bone_set_index)
     return attributes
+
+
+def __quantize_weights(weights, exact_sum):
+    """
+    Quantizes weights to unsigned shorts.
+
+    :param weights: a numpy array of shape (n, 4)
+    :param exact_sum: if every row of weights is normalized. The quantized weights of these rows are rounded so they sum to exactly 65535,
+    by rounding up the weights with the largest remainders
+    :return: a numpy array of unsigned shorts with the same shape as weights
+    """
+    scaled = weights * 65535
+    if not exact_sum:
+        return np.rint(scaled).astype(np.uint16)
+
+    quantized = np.floor(scaled)
+    remainders = scaled - quantized
+    deficits = 65535 - np.sum(quantized, axis=1)
+    deficits[np.sum(weights, axis=1) <= 0] = 0  # Rows without weights stay at 0
+    np.clip(deficits, 0, weights.shape[1], out=deficits)
+
+    # Rank the weights of every row by descending remainder, and round up as many as are needed to reach the exact sum
+    ranks = np.empty(weights.shape, dtype=np.int64)
+    np.put_along_axis(
+        ranks,
+        np.argsort(-remainders, axis=1, kind="stable"),
+        np.arange(weights.shape[1]),
+        axis=1,
+    )
+    quantized += ranks < deficits[:, None]
+
+    return quantized.astype(np.uint16)
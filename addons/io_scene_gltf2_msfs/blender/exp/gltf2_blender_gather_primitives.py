@@ -25,7 +25,7 @@ from .gltf2_blender_export_keys import (
 )
 
 from io_scene_gltf2_msfs.blender.exp.gltf2_blender_gather_cache import cached
-from io_scene_gltf2_msfs.blender.exp import gltf2_blender_extract
+from io_scene_gltf2_msfs.blender.exp import gltf2_blender_geometry_cache
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather_accessors
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather_primitive_attributes
 from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather_materials
@@ -104,7 +104,7 @@ def __gather_cache_primitives(
     """
     primitives = []
 
-    blender_primitives = gltf2_blender_extract.extract_primitives(
+    blender_primitives = gltf2_blender_geometry_cache.extract_primitives(
         None,
         blender_mesh,
         library,
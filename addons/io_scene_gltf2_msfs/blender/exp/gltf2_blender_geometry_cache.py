@@ -0,0 +1,221 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+
+import numpy as np
+
+from io_scene_gltf2_msfs.blender.exp import gltf2_blender_export_keys
+from io_scene_gltf2_msfs.blender.exp import gltf2_blender_extract
+from io_scene_gltf2_msfs.blender.exp import gltf2_blender_gather_skins
+from io_scene_gltf2_msfs.io.com import gltf2_io_dedup
+from io_scene_gltf2_msfs.io.com.gltf2_io_debug import print_console
+from io_scene_gltf2_msfs.io.exp import gltf2_io_geometry_cache
+
+# All export settings that change the result of extract_primitives
+GEOMETRY_SETTINGS = [
+    gltf2_blender_export_keys.NORMALS,
+    gltf2_blender_export_keys.TANGENTS,
+    gltf2_blender_export_keys.TEX_COORDS,
+    gltf2_blender_export_keys.COLORS,
+    gltf2_blender_export_keys.SKINS,
+    gltf2_blender_export_keys.MORPH,
+    gltf2_blender_export_keys.MORPH_NORMAL,
+    gltf2_blender_export_keys.MORPH_TANGENT,
+    gltf2_blender_export_keys.MATERIALS,
+    gltf2_blender_export_keys.YUP,
+    "emulate_asobo_optimization",
+    "gltf_loose_edges",
+    "gltf_loose_points",
+]
+
+# Source files of all code that changes the cached primitives. They are part of every key, so entries extracted by other versions of the
+# addon are never used
+EXTRACTOR_FILES = [
+    gltf2_blender_extract.__file__,
+    gltf2_io_dedup.__file__,
+    gltf2_io_geometry_cache.__file__,
+    __file__,
+]
+
+g_extractor_digest = None
+
+
+def extract_primitives(
+    glTF,
+    blender_mesh,
+    library,
+    blender_object,
+    blender_vertex_groups,
+    modifiers,
+    export_settings,
+):
+    """
+    Extract primitives from a mesh, like gltf2_blender_extract.extract_primitives, but reuse the primitives of a previous export if the
+    geometry cache is enabled and nothing they depend on has changed.
+
+    Reading the vertex groups of a skinned mesh for the cache key is a loop over all vertices, which is also the slowest part of extracting
+    it. Cached skinned meshes only save the rest of the extraction, and on a miss the vertex groups are passed on so they are only read once.
+    """
+    geometry_cache = export_settings.get("geometry_cache")
+    if geometry_cache is None:
+        return gltf2_blender_extract.extract_primitives(
+            glTF,
+            blender_mesh,
+            library,
+            blender_object,
+            blender_vertex_groups,
+            modifiers,
+            export_settings,
+        )
+
+    key, vertex_group_elements = __get_digest(
+        blender_mesh,
+        library,
+        blender_object,
+        blender_vertex_groups,
+        modifiers,
+        export_settings,
+    )
+
+    primitives = geometry_cache.load(key)
+    if primitives is not None:
+        print_console("INFO", "Using cached primitives: " + blender_mesh.name)
+        if export_settings["emulate_asobo_optimization"]:
+            for primitive in primitives:
+                export_settings["bounding_box"].add(primitive["attributes"]["POSITION"])
+        return primitives
+
+    primitives = gltf2_blender_extract.extract_primitives(
+        glTF,
+        blender_mesh,
+        library,
+        blender_object,
+        blender_vertex_groups,
+        modifiers,
+        export_settings,
+        vertex_group_elements,
+    )
+    geometry_cache.store(key, primitives)
+    return primitives
+
+
+def __get_digest(
+    blender_mesh,
+    library,
+    blender_object,
+    blender_vertex_groups,
+    modifiers,
+    export_settings,
+):
+    """
+    Hash everything extract_primitives reads, so that a changed mesh, object or setting never reuses outdated primitives.
+
+    :return (digest, vertex_group_elements): the hex digest, and the result of read_vertex_groups if the vertex groups were read
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    vertex_group_elements = None
+
+    def update(value):
+        digest.update(repr(value).encode("utf-8"))
+
+    def update_buffer(collection, attribute, dtype, components=1):
+        buffer = np.empty(len(collection) * components, dtype=dtype)
+        collection.foreach_get(attribute, buffer)
+        update((attribute, len(buffer)))
+        digest.update(buffer.tobytes())
+
+    def update_matrix(matrix):
+        digest.update(np.array(matrix, dtype=np.float64).tobytes())
+
+    digest.update(__get_extractor_digest())
+    update([export_settings[setting] for setting in GEOMETRY_SETTINGS])
+    update(library)
+
+    # Geometry
+    if export_settings[gltf2_blender_export_keys.NORMALS]:
+        blender_mesh.calc_normals_split()
+        update_buffer(blender_mesh.loops, "normal", np.float32, 3)
+    update_buffer(blender_mesh.vertices, "co", np.float32, 3)
+    update_buffer(blender_mesh.loops, "vertex_index", np.uint32)
+    update_buffer(blender_mesh.polygons, "loop_start", np.uint32)
+    update_buffer(blender_mesh.polygons, "loop_total", np.uint32)
+    update_buffer(blender_mesh.polygons, "material_index", np.uint32)
+    update_buffer(blender_mesh.edges, "vertices", np.uint32, 2)
+
+    # Tangents are calculated from the active UV map
+    update(
+        blender_mesh.uv_layers.active_index
+        if blender_mesh.uv_layers.active is not None
+        else None
+    )
+    for uv_layer in blender_mesh.uv_layers:
+        update_buffer(uv_layer.data, "uv", np.float32, 2)
+    for color_layer in blender_mesh.vertex_colors:
+        update_buffer(color_layer.data, "color", np.float32, 4)
+
+    if blender_mesh.shape_keys:
+        for key_block in blender_mesh.shape_keys.key_blocks:
+            update((key_block.name, key_block.mute, key_block.relative_key.name))
+            update_buffer(key_block.data, "co", np.float32, 3)
+
+    # Object and skinning
+    if blender_object:
+        update_matrix(blender_object.matrix_world)
+        update(
+            (
+                blender_object.parent_type,
+                blender_object.parent.name if blender_object.parent else None,
+            )
+        )
+    if modifiers is not None:
+        update([(modifier.type, modifier.name) for modifier in modifiers])
+
+    if blender_vertex_groups and (
+        export_settings[gltf2_blender_export_keys.SKINS]
+        or export_settings["emulate_asobo_optimization"]
+    ):
+        update([vertex_group.name for vertex_group in blender_vertex_groups])
+        # Vertex groups can't be read with foreach_get, so only read them if they can end up in the primitives
+        armature = None
+        if modifiers is not None:
+            for modifier in modifiers:
+                if modifier.type == "ARMATURE":
+                    armature = modifier.object
+        if armature:
+            update(armature.name)
+            update_matrix(armature.matrix_world)
+            skin = gltf2_blender_gather_skins.gather_skin(armature, export_settings)
+            if skin:
+                update([joint.name for joint in skin.joints])
+
+            vertex_group_elements = gltf2_blender_extract.read_vertex_groups(
+                blender_mesh
+            )
+            for array in vertex_group_elements:
+                digest.update(array.tobytes())
+
+    return digest.hexdigest(), vertex_group_elements
+
+
+def __get_extractor_digest():
+    global g_extractor_digest
+
+    if g_extractor_digest is None:
+        extractor_digest = hashlib.blake2b(digest_size=20)
+        for filename in EXTRACTOR_FILES:
+            with open(filename, "rb") as f:
+                extractor_digest.update(f.read())
+        g_extractor_digest = extractor_digest.digest()
+    return g_extractor_digest
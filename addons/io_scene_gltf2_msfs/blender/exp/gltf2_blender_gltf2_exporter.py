@@ -23,6 +23,7 @@ from ... import get_version_string
 from io_scene_gltf2_msfs.io.com import gltf2_io
 from io_scene_gltf2_msfs.io.com import gltf2_io_debug
 from io_scene_gltf2_msfs.io.com import gltf2_io_extensions
+from io_scene_gltf2_msfs.io.exp import gltf2_io_asobo_buffer_views
 from io_scene_gltf2_msfs.io.exp import gltf2_io_binary_data
 from io_scene_gltf2_msfs.io.exp import gltf2_io_buffer
 from io_scene_gltf2_msfs.io.exp import gltf2_io_image_data
@@ -114,6 +115,19 @@ class GlTF2Exporter:
             gltf2_io.MaterialOcclusionTextureInfoClass,
         ]
 
+        # Index of every child of root property in its root level array. The properties have no __eq__, so they are unique by identity
+        self.__childOfRootIndices = {
+            id(gltf_list): {}
+            for gltf_list in self.__childOfRootPropertyTypeLookup.values()
+        }
+        # Amount of leading items of every root level array that are in __childOfRootIndices
+        self.__childOfRootIndexedCounts = {
+            id(gltf_list): 0
+            for gltf_list in self.__childOfRootPropertyTypeLookup.values()
+        }
+        # Members of every property type that need to be traversed, in the order they were found by dir()
+        self.__propertyMembers = {}
+
         self.__traverse(asset)
 
     @property
@@ -125,27 +139,30 @@ class GlTF2Exporter:
     def add_asobo_buffer_views(
         self, buffer_views
     ):  # This assumes there are no buffer views already in the glTF
-        for asobo_buffer_view in buffer_views:
-            # Add the buffer view to the glTF buffer views
-            self.__gltf.buffer_views.append(asobo_buffer_view)
-            binary_data = asobo_buffer_view.buffer.to_bytes()
-            offset = self.__buffer.add(binary_data)
-            asobo_buffer_view.buffer = 0
-            asobo_buffer_view.byte_length = len(binary_data)
-            asobo_buffer_view.byte_offset = offset
-
-    def finalize_buffer(self, output_path=None, buffer_name=None, is_glb=False):
-        """Finalize the glTF and write buffers."""
+        # Add the buffer views to the glTF buffer views, and their data to the glTF buffer
+        self.__gltf.buffer_views.extend(buffer_views)
+        gltf2_io_asobo_buffer_views.AsoboBufferViews.move_to_buffer(
+            buffer_views, self.__buffer
+        )
+
+    def finalize_buffer(self, buffer_name=None, is_glb=False):
+        """
+        Finalize the glTF and its buffer.
+
+        The buffer is embedded as a data URI, unless it's written to the GLB file or to a separate file called buffer_name.
+        :return: the chunks of the buffer to write, without joining them
+        """
         if self.__finalized:
             raise RuntimeError("Tried to finalize buffers for finalized glTF file")
 
+        chunks = []
         if self.__buffer.byte_length > 0:
             if is_glb:
                 uri = None
-            elif output_path and buffer_name:
-                with open(output_path + buffer_name, "wb") as f:
-                    f.write(self.__buffer.to_bytes())
+                chunks = self.__buffer.chunks
+            elif buffer_name:
                 uri = buffer_name
+                chunks = self.__buffer.chunks
             else:
                 uri = self.__buffer.to_embed_string()
 
@@ -160,8 +177,7 @@ class GlTF2Exporter:
 
         self.__finalized = True
 
-        if is_glb:
-            return self.__buffer.to_bytes()
+        return chunks
 
     def add_draco_extension(self):
         """
@@ -344,7 +360,7 @@ class GlTF2Exporter:
             # The object is not of a child of root --> don't convert to reference
             return property
 
-        return self.__append_unique_and_get_index(gltf_list, property)
+        return self.__append_child_of_root_and_get_index(gltf_list, property)
 
     def add_extension_required(self, extension):
         """
@@ -366,6 +382,22 @@ class GlTF2Exporter:
         if extension not in self.__gltf.extensions_used:
             self.__gltf.extensions_used.append(extension)
 
+    def __append_child_of_root_and_get_index(self, target: list, obj):
+        indices = self.__childOfRootIndices[id(target)]
+
+        # Index the properties that were appended to the array directly, like the Asobo buffer views
+        indexed_count = self.__childOfRootIndexedCounts[id(target)]
+        for index in range(indexed_count, len(target)):
+            indices.setdefault(id(target[index]), index)
+
+        index = indices.get(id(obj))
+        if index is None:
+            index = len(target)
+            target.append(obj)
+            indices[id(obj)] = index
+        self.__childOfRootIndexedCounts[id(target)] = len(target)
+        return index
+
     @staticmethod
     def __append_unique_and_get_index(target: list, obj):
         if obj in target:
@@ -418,52 +450,60 @@ class GlTF2Exporter:
 
     def __traverse(self, node):
         """
-        Recursively traverse a scene graph consisting of gltf compatible elements.
+        Traverse a scene graph consisting of gltf compatible elements.
 
         The tree is traversed downwards until a primitive is reached. Then any ChildOfRoot property
         is stored in the according list in the glTF and replaced with a index reference in the upper level.
         """
+        visitor = self.__get_visitor(node)
+        if visitor is None:
+            return self.__convert_leaf(node)
+
+        # Instead of recursing, every visitor is a generator that yields the values it needs traversed, and is sent their traversed
+        # values back. This keeps the order of the recursive traversal, but deep scene graphs can't hit the recursion limit
+        stack = [visitor]
+        value = None
+        while stack:
+            try:
+                child = stack[-1].send(value)
+            except StopIteration as e:
+                stack.pop()
+                value = e.value
+                continue
+
+            visitor = self.__get_visitor(child)
+            if visitor is None:
+                value = self.__convert_leaf(child)
+            else:
+                stack.append(visitor)
+                value = None
+        return value
 
-        def __traverse_property(node):
-            for member_name in [
-                a
-                for a in dir(node)
-                if not a.startswith("__") and not callable(getattr(node, a))
-            ]:
-                new_value = self.__traverse(getattr(node, member_name))
-                setattr(
-                    node, member_name, new_value
-                )  # usually this is the same as before
-
-                # # TODO: maybe with extensions hooks we can find a more elegant solution
-                # if member_name == "extensions" and new_value is not None:
-                #     for extension_name in new_value.keys():
-                #         self.__append_unique_and_get_index(self.__gltf.extensions_used, extension_name)
-                #         self.__append_unique_and_get_index(self.__gltf.extensions_required, extension_name)
-            return node
+    def __get_visitor(self, node):
+        node_type = type(node)
 
         # traverse nodes of a child of root property type and add them to the glTF root
-        if type(node) in self.__childOfRootPropertyTypeLookup:
-            node = __traverse_property(node)
-            idx = self.__to_reference(node)
-            # child of root properties are only present at root level --> replace with index in upper level
-            return idx
+        if node_type in self.__childOfRootPropertyTypeLookup:
+            return self.__visit_child_of_root_property(node)
 
         # traverse lists, such as children and replace them with indices
         if isinstance(node, list):
-            for i in range(len(node)):
-                node[i] = self.__traverse(node[i])
-            return node
+            return self.__visit_list(node)
 
         if isinstance(node, dict):
-            for key in node.keys():
-                node[key] = self.__traverse(node[key])
-            return node
+            return self.__visit_dict(node)
 
         # traverse into any other property
-        if type(node) in self.__propertyTypeLookup:
-            return __traverse_property(node)
+        if node_type in self.__propertyTypeLookup:
+            return self.__visit_property(node)
+
+        # extensions
+        if isinstance(node, gltf2_io_extensions.Extension):
+            return self.__visit_extension(node)
+
+        return None
 
+    def __convert_leaf(self, node):
         # binary data needs to be moved to a buffer and referenced with a buffer view
         if isinstance(node, gltf2_io_binary_data.BinaryData):
             buffer_view = self.__buffer.add_and_get_view(node)
@@ -474,29 +514,73 @@ class GlTF2Exporter:
             image = self.__add_image(node)
             return image
 
-        # extensions
-        if isinstance(node, gltf2_io_extensions.Extension):
-            extension = self.__traverse(node.extension)
-            self.__append_unique_and_get_index(self.__gltf.extensions_used, node.name)
-            if node.required:
-                self.__append_unique_and_get_index(
-                    self.__gltf.extensions_required, node.name
-                )
-
-            # extensions that lie in the root of the glTF.
-            # They need to be converted to a reference at place of occurrence
-            if isinstance(node, gltf2_io_extensions.ChildOfRootExtension):
-                root_extension_list = self.__get_key_path(
-                    self.__gltf.extensions, [node.name] + node.path, []
-                )
-                idx = self.__append_unique_and_get_index(root_extension_list, extension)
-                return idx
-
-            return extension
-
         # do nothing for any type that does not match a glTF schema (primitives)
         return node
 
+    def __get_property_members(self, node):
+        node_type = type(node)
+        members = self.__propertyMembers.get(node_type)
+        if members is None:
+            # All instances of a property type have the same members, so only look them up once. Slots that are only used by the
+            # importer are never set
+            members = [
+                a
+                for a in dir(node)
+                if not a.startswith("__")
+                and hasattr(node, a)
+                and not callable(getattr(node, a))
+            ]
+            self.__propertyMembers[node_type] = members
+        return members
+
+    def __visit_property(self, node):
+        for member_name in self.__get_property_members(node):
+            new_value = yield getattr(node, member_name)
+            setattr(node, member_name, new_value)  # usually this is the same as before
+
+            # # TODO: maybe with extensions hooks we can find a more elegant solution
+            # if member_name == "extensions" and new_value is not None:
+            #     for extension_name in new_value.keys():
+            #         self.__append_unique_and_get_index(self.__gltf.extensions_used, extension_name)
+            #         self.__append_unique_and_get_index(self.__gltf.extensions_required, extension_name)
+        return node
+
+    def __visit_child_of_root_property(self, node):
+        node = yield from self.__visit_property(node)
+        # child of root properties are only present at root level --> replace with index in upper level
+        return self.__to_reference(node)
+
+    @staticmethod
+    def __visit_list(node):
+        for i in range(len(node)):
+            node[i] = yield node[i]
+        return node
+
+    @staticmethod
+    def __visit_dict(node):
+        for key in node.keys():
+            node[key] = yield node[key]
+        return node
+
+    def __visit_extension(self, node):
+        extension = yield node.extension
+        self.__append_unique_and_get_index(self.__gltf.extensions_used, node.name)
+        if node.required:
+            self.__append_unique_and_get_index(
+                self.__gltf.extensions_required, node.name
+            )
+
+        # extensions that lie in the root of the glTF.
+        # They need to be converted to a reference at place of occurrence
+        if isinstance(node, gltf2_io_extensions.ChildOfRootExtension):
+            root_extension_list = self.__get_key_path(
+                self.__gltf.extensions, [node.name] + node.path, []
+            )
+            idx = self.__append_unique_and_get_index(root_extension_list, extension)
+            return idx
+
+        return extension
+
 
 def _path_to_uri(path):
     path = os.path.normpath(path)
@@ -20,6 +20,8 @@ from ...io.imp.gltf2_io_binary import BinaryData
 from ..com.gltf2_blender_extras import set_extras
 from .gltf2_blender_material import BlenderMaterial
 from ...io.com.gltf2_io_debug import print_console
+from ...io.com.gltf2_io_asobo_indices import rebase_indices, reverse_winding
+from ...io.com.gltf2_io_dedup import unique_records
 from .gltf2_io_draco_compression_extension import decode_primitive
 
 
@@ -184,9 +186,9 @@ def do_primitives(gltf, mesh_idx, skin_idx, mesh, ob):
             indices = np.arange(0, num_verts, dtype=np.uint32)
 
         if is_asobo_optimized:
-            indices = list(
-                x + base_vertex_index
-                for x in indices[start_index : (start_index + (tri_count * 3))]
+            indices = rebase_indices(
+                indices[start_index : (start_index + (tri_count * 3))],
+                base_vertex_index,
             )
 
         mode = 4 if prim.mode is None else prim.mode
@@ -544,13 +546,7 @@ def points_edges_tris(mode, indices, is_asobo_optimized):
         #  / \   / \
         # 0---1 4---5
         if is_asobo_optimized:
-            tris = np.array(
-                [
-                    (indices[i + 2], indices[i + 1], indices[i])
-                    for i in range(0, len(indices), 3)
-                ]
-            )
-            tris = squish(tris)
+            tris = reverse_winding(indices)
         else:
             tris = indices
 
@@ -776,7 +772,7 @@ def merge_duplicate_verts(
     # so we currently treat the normal as per-vert.
     #
     # Strategy is simple: put all the per-vert data into an array of structs
-    # ("dots"), dedupe with np.unique, then take all the data back out.
+    # ("dots"), dedupe with unique_records, then take all the data back out.
 
     # Very often two verts that "morally" should be merged will have normals
     # with very small differences. Round off the normals to smooth this over.
@@ -828,7 +824,7 @@ def merge_duplicate_verts(
         dots["sk%dy" % i] = locs[:, 1]
         dots["sk%dz" % i] = locs[:, 2]
 
-    unique_dots, inv_indices = np.unique(dots, return_inverse=True)
+    unique_dots, inv_indices = unique_records(dots)
 
     loop_vidxs = inv_indices[loop_vidxs]
     edge_vidxs = inv_indices[edge_vidxs]
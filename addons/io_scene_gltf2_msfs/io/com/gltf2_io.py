@@ -16,7 +16,7 @@
 # command used:
 # quicktype --src glTF.schema.json --src-lang schema -t gltf --lang python --python-version 3.5
 
-# TODO: add __slots__ to all classes by extending the generator
+# NOTE: __slots__ were added to all classes by hand, keep them in sync with the constructors
 
 # TODO: REMOVE traceback import
 
@@ -40,6 +40,10 @@ def from_none(x):
 
 
 def from_union(fs, x):
+    # All unions end with from_none, and the other types never accept None. Optional values are mostly None, so skip the failing
+    # conversions and their exceptions
+    if x is None and fs[-1] is from_none:
+        return None
     tracebacks = []
     for f in fs:
         try:
@@ -123,6 +127,8 @@ class AccessorSparseIndices:
     Indices of those attributes that deviate from their initialization value.
     """
 
+    __slots__ = ("buffer_view", "byte_offset", "component_type", "extensions", "extras")
+
     def __init__(self, buffer_view, byte_offset, component_type, extensions, extras):
         self.buffer_view = buffer_view
         self.byte_offset = byte_offset
@@ -166,6 +172,8 @@ class AccessorSparseValues:
     accessor attributes pointed by `accessor.sparse.indices`.
     """
 
+    __slots__ = ("buffer_view", "byte_offset", "extensions", "extras")
+
     def __init__(self, buffer_view, byte_offset, extensions, extras):
         self.buffer_view = buffer_view
         self.byte_offset = byte_offset
@@ -198,6 +206,8 @@ class AccessorSparseValues:
 class AccessorSparse:
     """Sparse storage of attributes that deviate from their initialization value."""
 
+    __slots__ = ("count", "extensions", "extras", "indices", "values")
+
     def __init__(self, count, extensions, extras, indices, values):
         self.count = count
         self.extensions = extensions
@@ -236,6 +246,21 @@ class Accessor:
     WebGL's `vertexAttribPointer()` defines an attribute in a buffer.
     """
 
+    __slots__ = (
+        "buffer_view",
+        "byte_offset",
+        "component_type",
+        "count",
+        "extensions",
+        "extras",
+        "min",
+        "max",
+        "normalized",
+        "sparse",
+        "type",
+        "name",
+    )
+
     def __init__(
         self,
         buffer_view,
@@ -332,6 +357,8 @@ class AnimationChannelTarget:
     The index of the node and TRS property that an animation channel targets.
     """
 
+    __slots__ = ("extensions", "extras", "node", "path")
+
     def __init__(self, extensions, extras, node, path):
         self.extensions = extensions
         self.extras = extras
@@ -364,6 +391,8 @@ class AnimationChannelTarget:
 class AnimationChannel:
     """Targets an animation's sampler at a node's property."""
 
+    __slots__ = ("extensions", "extras", "sampler", "target")
+
     def __init__(self, extensions, extras, sampler, target):
         self.extensions = extensions
         self.extras = extras
@@ -398,6 +427,8 @@ class AnimationSampler:
     graph (but not its target).
     """
 
+    __slots__ = ("extensions", "extras", "input", "output", "interpolation")
+
     def __init__(self, extensions, extras, input, output, interpolation):
         self.extensions = extensions
         self.extras = extras
@@ -433,6 +464,16 @@ class AnimationSampler:
 class Animation:
     """A keyframe animation."""
 
+    __slots__ = (
+        "name",
+        "channels",
+        "extensions",
+        "extras",
+        "samplers",
+        # Set by the importer
+        "track_name",
+    )
+
     def __init__(self, name, channels, extensions, extras, samplers):
         self.name = name
         self.channels = channels
@@ -472,6 +513,15 @@ class Animation:
 class Asset:
     """Metadata about the glTF asset."""
 
+    __slots__ = (
+        "copyright",
+        "extras",
+        "generator",
+        "min_version",
+        "version",
+        "extensions",
+    )
+
     def __init__(self, copyright, extras, generator, min_version, version, extensions):
         self.copyright = copyright
         self.extras = extras
@@ -510,6 +560,17 @@ class Asset:
 class BufferView:
     """A view into a buffer generally representing a subset of the buffer."""
 
+    __slots__ = (
+        "buffer",
+        "byte_length",
+        "byte_stride",
+        "byte_offset",
+        "extensions",
+        "extras",
+        "target",
+        "name",
+    )
+
     def __init__(
         self,
         buffer,
@@ -573,6 +634,8 @@ class BufferView:
 class Buffer:
     """A buffer points to binary geometry, animation, or skins."""
 
+    __slots__ = ("byte_length", "extensions", "name", "uri", "extras")
+
     def __init__(self, byte_length, extensions, name, uri, extras):
         self.byte_length = byte_length
         self.extensions = extensions
@@ -608,6 +671,8 @@ class Buffer:
 class CameraOrthographic:
     """An orthographic camera containing properties to create an orthographic projection matrix."""
 
+    __slots__ = ("extensions", "extras", "xmag", "ymag", "zfar", "znear")
+
     def __init__(self, extensions, extras, xmag, ymag, zfar, znear):
         self.extensions = extensions
         self.extras = extras
@@ -646,6 +711,8 @@ class CameraOrthographic:
 class CameraPerspective:
     """A perspective camera containing properties to create a perspective projection matrix."""
 
+    __slots__ = ("aspect_ratio", "extensions", "extras", "yfov", "zfar", "znear")
+
     def __init__(self, aspect_ratio, extensions, extras, yfov, zfar, znear):
         self.aspect_ratio = aspect_ratio
         self.extensions = extensions
@@ -686,6 +753,8 @@ class Camera:
     camera in the scene.
     """
 
+    __slots__ = ("extensions", "extras", "name", "orthographic", "perspective", "type")
+
     def __init__(self, extensions, extras, name, orthographic, perspective, type):
         self.extensions = extensions
         self.extras = extras
@@ -734,6 +803,17 @@ class Image:
     index. `mimeType` is required in the latter case.
     """
 
+    __slots__ = (
+        "buffer_view",
+        "extensions",
+        "extras",
+        "mime_type",
+        "name",
+        "uri",
+        # Set by the importer
+        "blender_image_name",
+    )
+
     def __init__(self, buffer_view, extensions, extras, mime_type, name, uri):
         self.buffer_view = buffer_view
         self.extensions = extensions
@@ -779,6 +859,8 @@ class TextureInfo:
     Reference to a texture.
     """
 
+    __slots__ = ("extensions", "extras", "index", "tex_coord")
+
     def __init__(self, extensions, extras, index, tex_coord):
         self.extensions = extensions
         self.extras = extras
@@ -814,6 +896,8 @@ class MaterialNormalTextureInfoClass:
     Reference to a texture.
     """
 
+    __slots__ = ("extensions", "extras", "index", "scale", "tex_coord")
+
     def __init__(self, extensions, extras, index, scale, tex_coord):
         self.extensions = extensions
         self.extras = extras
@@ -854,6 +938,8 @@ class MaterialOcclusionTextureInfoClass:
     Reference to a texture.
     """
 
+    __slots__ = ("extensions", "extras", "index", "strength", "tex_coord")
+
     def __init__(self, extensions, extras, index, strength, tex_coord):
         self.extensions = extensions
         self.extras = extras
@@ -897,6 +983,16 @@ class MaterialPBRMetallicRoughness:
     from Physically-Based Rendering (PBR) methodology.
     """
 
+    __slots__ = (
+        "base_color_factor",
+        "extensions",
+        "extras",
+        "metallic_factor",
+        "roughness_factor",
+        "base_color_texture",
+        "metallic_roughness_texture",
+    )
+
     def __init__(
         self,
         base_color_factor,
@@ -974,6 +1070,22 @@ class MaterialPBRMetallicRoughness:
 class Material:
     """The material appearance of a primitive."""
 
+    __slots__ = (
+        "name",
+        "alpha_cutoff",
+        "alpha_mode",
+        "double_sided",
+        "normal_texture",
+        "occlusion_texture",
+        "emissive_texture",
+        "emissive_factor",
+        "pbr_metallic_roughness",
+        "extensions",
+        "extras",
+        # Set by the importer
+        "blender_material",
+    )
+
     def __init__(
         self,
         name,
@@ -1078,6 +1190,18 @@ class Material:
 class MeshPrimitive:
     """Geometry to be rendered with the given material."""
 
+    __slots__ = (
+        "attributes",
+        "extensions",
+        "indices",
+        "material",
+        "mode",
+        "extras",
+        "targets",
+        # Set by the importer
+        "num_faces",
+    )
+
     def __init__(
         self, attributes, extensions, indices, material, mode, extras, targets
     ):
@@ -1131,6 +1255,17 @@ class Mesh:
     places the mesh in the scene.
     """
 
+    __slots__ = (
+        "extensions",
+        "extras",
+        "primitives",
+        "name",
+        "weights",
+        # Set by the importer
+        "blender_name",
+        "shapekey_names",
+    )
+
     def __init__(self, extensions, extras, primitives, name, weights):
         self.extensions = extensions
         self.extras = extras
@@ -1180,6 +1315,24 @@ class Node:
     may be present; `matrix` will not be present.
     """
 
+    __slots__ = (
+        "camera",
+        "extensions",
+        "extras",
+        "matrix",
+        "translation",
+        "rotation",
+        "scale",
+        "mesh",
+        "skin",
+        "name",
+        "children",
+        "weights",
+        # Set by the importer
+        "animations",
+        "weight_animation",
+    )
+
     def __init__(
         self,
         camera,
@@ -1287,6 +1440,16 @@ class Node:
 class Sampler:
     """Texture sampler properties for filtering and wrapping modes."""
 
+    __slots__ = (
+        "extensions",
+        "extras",
+        "mag_filter",
+        "min_filter",
+        "name",
+        "wrap_s",
+        "wrap_t",
+    )
+
     def __init__(
         self, extensions, extras, mag_filter, min_filter, name, wrap_s, wrap_t
     ):
@@ -1330,6 +1493,8 @@ class Sampler:
 class Scene:
     """The root nodes of a scene."""
 
+    __slots__ = ("extensions", "extras", "name", "nodes")
+
     def __init__(self, extensions, extras, name, nodes):
         self.extensions = extensions
         self.extras = extras
@@ -1366,6 +1531,15 @@ class Scene:
 class Skin:
     """Joints and matrices defining a skin."""
 
+    __slots__ = (
+        "extensions",
+        "extras",
+        "inverse_bind_matrices",
+        "joints",
+        "skeleton",
+        "name",
+    )
+
     def __init__(
         self, extensions, extras, inverse_bind_matrices, joints, skeleton, name
     ):
@@ -1410,6 +1584,8 @@ class Skin:
 class Texture:
     """A texture and its sampler."""
 
+    __slots__ = ("extensions", "extras", "name", "sampler", "source")
+
     def __init__(self, extensions, extras, name, sampler, source):
         self.extensions = extensions
         self.extras = extras
@@ -1445,6 +1621,28 @@ class Texture:
 class Gltf:
     """The root object for a glTF asset."""
 
+    __slots__ = (
+        "accessors",
+        "animations",
+        "asset",
+        "buffers",
+        "buffer_views",
+        "cameras",
+        "extensions",
+        "extensions_required",
+        "extensions_used",
+        "extras",
+        "images",
+        "materials",
+        "meshes",
+        "nodes",
+        "samplers",
+        "scene",
+        "scenes",
+        "skins",
+        "textures",
+    )
+
     def __init__(
         self,
         accessors,
@@ -0,0 +1,51 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Imports
+#
+
+import numpy as np
+
+#
+# Functions
+#
+
+
+def reverse_winding(indices, dtype=None):
+    """
+    Reverses the winding of every triangle in a triangle list. Asobo optimized meshes use the opposite winding of glTF.
+
+    :param indices: a numpy array of triangle indices
+    :param dtype: the dtype of the returned array. If this is None, the dtype of indices is kept
+    :return: a new numpy array with the last and first index of every triangle swapped
+    """
+    indices = np.asarray(indices)
+    reversed_indices = indices.reshape(-1, 3)[:, ::-1].reshape(-1)
+    return reversed_indices.astype(indices.dtype if dtype is None else dtype, copy=True)
+
+
+def rebase_indices(indices, base_vertex_index, dtype=np.uint32):
+    """
+    Adds the base vertex index of an Asobo primitive to its indices.
+
+    :param indices: a numpy array of indices, relative to the base vertex index
+    :param base_vertex_index: an int or None
+    :param dtype: the dtype of the returned array. Rebased indices may not fit in the dtype of indices, so this defaults to uint32
+    :return: a new numpy array with the absolute indices
+    """
+    rebased_indices = np.asarray(indices).astype(dtype, copy=True)
+    if base_vertex_index:
+        rebased_indices += base_vertex_index
+    return rebased_indices
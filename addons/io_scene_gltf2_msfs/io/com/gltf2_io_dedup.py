@@ -0,0 +1,131 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Imports
+#
+
+import numpy as np
+
+#
+# Functions
+#
+
+
+def unique_records(records):
+    """
+    Deduplicates the records of a structured array, like np.unique(records, return_inverse=True), but keeps the records in the order they first
+    occur instead of sorting them.
+
+    np.unique sorts structured arrays with a field by field comparison, which is very slow for the wide per-loop records built by the exporter and
+    the importer. Instead, every record is treated as a fixed-width byte key: the keys are hashed to 64-bit integers, which NumPy can sort quickly,
+    and records with equal hashes are then compared byte for byte. If two different records ever share a hash, the keys are deduplicated with a
+    hash table instead, so the result is always exact and deterministic.
+
+    Float fields are compared by value, so -0.0 and 0.0 are merged like np.unique does.
+
+    :param records: a one-dimensional structured numpy array
+    :return (unique_records, inverse): the unique records in first occurrence order, and the index into unique_records of every record
+    """
+    count = len(records)
+    if count == 0:
+        return records[:0].copy(), np.empty(0, dtype=np.intp)
+
+    keys = __get_keys(records)
+    hashes = __hash_keys(keys)
+
+    # Group equal hashes, and use the lowest index in every group as its first occurrence
+    order = np.argsort(hashes)
+    sorted_hashes = hashes[order]
+    group_starts = np.empty(count, dtype=bool)
+    group_starts[0] = True
+    np.not_equal(sorted_hashes[1:], sorted_hashes[:-1], out=group_starts[1:])
+    first = np.minimum.reduceat(order, np.flatnonzero(group_starts))
+    inverse = np.empty(count, dtype=np.intp)
+    inverse[order] = np.cumsum(group_starts) - 1
+
+    if not np.array_equal(keys, keys[first[inverse]]):
+        # Hash collision, fall back to exact keys
+        first, inverse = __unique_keys_exact(keys)
+    else:
+        # The groups are in hash order, move them into first occurrence order
+        is_first = np.zeros(count, dtype=bool)
+        is_first[first] = True
+        rank = np.cumsum(is_first) - 1
+        inverse = rank[first][inverse]
+        first = np.flatnonzero(is_first)
+
+    # Gathering whole records is much faster than gathering a structured array field by field
+    record_dtype = np.dtype((np.void, records.dtype.itemsize))
+    unique = np.ascontiguousarray(records).view(record_dtype)[first]
+    return unique.view(records.dtype), inverse
+
+
+def __get_keys(records):
+    # Copy the records into rows of 64-bit words, zero padded to a whole word
+    itemsize = records.dtype.itemsize
+    padded_itemsize = -(-itemsize // 8) * 8
+    key_bytes = np.zeros((len(records), padded_itemsize), dtype=np.uint8)
+    key_bytes[:, :itemsize] = (
+        np.ascontiguousarray(records).view(np.uint8).reshape(len(records), itemsize)
+    )
+
+    # Turn -0.0 into 0.0, so that records that compare equal also have equal bytes
+    fields = records.dtype.fields
+    key_dtype = np.dtype(
+        {
+            "names": list(fields),
+            "formats": [fields[name][0] for name in fields],
+            "offsets": [fields[name][1] for name in fields],
+            "itemsize": padded_itemsize,
+        }
+    )
+    key_records = key_bytes.view(key_dtype).reshape(-1)
+    for name in fields:
+        if fields[name][0].kind == "f":
+            values = key_records[name]
+            values[values == 0] = 0
+
+    return key_bytes.view(np.uint64)
+
+
+def __hash_keys(keys):
+    # FNV-1a style combination of the words, with a splitmix64 finalizer to spread the bits
+    hashes = np.full(len(keys), 0xCBF29CE484222325, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(keys.shape[1]):
+            hashes ^= keys[:, i]
+            hashes *= np.uint64(0x100000001B3)
+            hashes ^= hashes >> np.uint64(32)
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= np.uint64(0x94D049BB133111EB)
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def __unique_keys_exact(keys):
+    key_map = {}
+    first = []
+    inverse = np.empty(len(keys), dtype=np.intp)
+    for i, key in enumerate(
+        keys.view(np.dtype((np.void, keys.shape[1] * 8))).reshape(-1).tolist()
+    ):
+        index = key_map.get(key)
+        if index is None:
+            index = key_map[key] = len(first)
+            first.append(i)
+        inverse[i] = index
+    return np.array(first, dtype=np.intp), inverse
@@ -13,32 +13,113 @@
 # limitations under the License.
 
 import base64
-import struct
+import hashlib
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 
 from io_scene_gltf2_msfs.io.com import gltf2_io
 from io_scene_gltf2_msfs.io.com import gltf2_io_constants
+from io_scene_gltf2_msfs.io.com.gltf2_io_asobo_indices import reverse_winding
+from io_scene_gltf2_msfs.io.com.gltf2_io_debug import print_console
 from io_scene_gltf2_msfs.io.exp import gltf2_io_binary_data
 
-STRUCT_POSITION = struct.Struct("fff")
-STRUCT_TANGENT = struct.Struct("bbbb")
-STRUCT_NORMAL = struct.Struct("bbbb")
-STRUCT_UV = struct.Struct("ee")
-STRUCT_JOINT = struct.Struct("HHHH")
-STRUCT_WEIGHT1 = struct.Struct("f")
-STRUCT_WEIGHT4 = struct.Struct("HHHH")
-STRUCT_COLOR_VTX = struct.Struct("HHHH")
-STRUCT_COLOR_BLEND = struct.Struct("bbbb")
+# Interleaved vertex layouts used by the sim. Each field is named after the attribute stored at that offset, and any
+# bytes not covered by a field are left as zero padding.
+VERTEX_ND_DTYPE = np.dtype(
+    {
+        "names": [
+            "POSITION",
+            "TANGENT",
+            "NORMAL",
+            "TEXCOORD_0",
+            "TEXCOORD_1",
+            "COLOR_0",
+        ],
+        "formats": [
+            (np.float32, (3,)),
+            (np.int8, (4,)),
+            (np.int8, (4,)),
+            (np.float16, (2,)),
+            (np.float16, (2,)),
+            (np.uint16, (4,)),
+        ],
+        "offsets": [0, 12, 16, 20, 24, 28],
+        "itemsize": 36,
+    }
+)
+VERTEX_BLEND1_DTYPE = np.dtype(
+    {
+        "names": [
+            "POSITION",
+            "TANGENT",
+            "NORMAL",
+            "TEXCOORD_0",
+            "TEXCOORD_1",
+            "JOINTS_0",
+            "WEIGHTS_0",
+            "COLOR_0",
+        ],
+        "formats": [
+            (np.float32, (3,)),
+            (np.int8, (4,)),
+            (np.int8, (4,)),
+            (np.float16, (2,)),
+            (np.float16, (2,)),
+            (np.uint16, (4,)),
+            np.float32,
+            (np.int8, (4,)),
+        ],
+        "offsets": [0, 12, 16, 20, 24, 28, 36, 40],
+        "itemsize": 44,
+    }
+)
+VERTEX_BLEND4_DTYPE = np.dtype(
+    {
+        "names": [
+            "POSITION",
+            "TANGENT",
+            "NORMAL",
+            "TEXCOORD_0",
+            "TEXCOORD_1",
+            "JOINTS_0",
+            "WEIGHTS_0",
+            "COLOR_0",
+        ],
+        "formats": [
+            (np.float32, (3,)),
+            (np.int8, (4,)),
+            (np.int8, (4,)),
+            (np.float16, (2,)),
+            (np.float16, (2,)),
+            (np.uint16, (4,)),
+            (np.uint16, (4,)),
+            (np.int8, (4,)),
+        ],
+        "offsets": [0, 12, 16, 20, 24, 28, 36, 44],
+        "itemsize": 48,
+    }
+)
 
 SPLIT_INDEX = 65530  # Must be a multiple of 3, and not be greater than 65535.  We use 65530 instead of 65535 as that seems to be the max index the sim uses
 
 
 class AsoboBuffer:
     def __init__(self, buffer_index=0):
-        self.__data = b""
+        # Data is kept as a list of chunks that are only joined when needed. Appending to an immutable bytes object
+        # copies all previous data on every append, which gets very slow for large buffers
+        self.__chunks = []
+        self.__byte_length = 0
         self.__buffer_index = buffer_index
 
+        # Offsets of the blocks added with append_unique_bytes, keyed by their length and digest
+        self.__blocks = {}
+        self.__bytes_saved = 0
+
+    def __append(self, data):
+        self.__chunks.append(data)
+        self.__byte_length += len(data)
+
     def append_data(
         self,
         binary_data: gltf2_io_binary_data.BinaryData,
@@ -48,15 +129,15 @@ class AsoboBuffer:
         """Add binary data to the buffer. Return a glTF BufferView."""
         offset = None
         if calculate_offset:
-            offset = len(self.__data)
+            offset = self.__byte_length
 
-        self.__data += binary_data.data
+        self.__append(binary_data.data)
 
         # offsets should be a multiple of 4 --> therefore add padding if necessary
         if check_padding:
             padding = (4 - (binary_data.byte_length % 4)) % 4
             if padding != 0:
-                self.__data += b"\x00" * padding
+                self.__append(b"\x00" * padding)
 
         return offset
 
@@ -66,26 +147,63 @@ class AsoboBuffer:
         """Add binary data to the buffer. Return a glTF BufferView."""
         offset = None
         if calculate_offset:
-            offset = len(self.__data)
+            offset = self.__byte_length
+
+        self.__append(binary_data)
+
+        return offset
+
+    def append_unique_bytes(self, binary_data: bytes, check_padding=False) -> int:
+        """
+        Add binary data to the buffer, unless an identical block has already been added. Return the offset of the block.
+        Many meshes are modelled separately but end up with byte-identical vertex and index data, which only needs to be stored once.
+        """
+        key = (len(binary_data), hashlib.blake2b(binary_data, digest_size=16).digest())
+        offset = self.__blocks.get(key)
+        if offset is not None:
+            self.__bytes_saved += len(binary_data)
+            return offset
 
-        self.__data += binary_data
+        offset = self.__byte_length
+        self.__append(binary_data)
 
+        # offsets should be a multiple of 4 --> therefore add padding if necessary
+        if check_padding:
+            padding = (4 - (len(binary_data) % 4)) % 4
+            if padding != 0:
+                self.__append(b"\x00" * padding)
+
+        self.__blocks[key] = offset
         return offset
 
     @property
     def byte_length(self):
-        return len(self.__data)
+        return self.__byte_length
+
+    @property
+    def bytes_saved(self):
+        """The amount of bytes that weren't added to the buffer because an identical block was already present."""
+        return self.__bytes_saved
+
+    @property
+    def chunks(self):
+        """The data of the buffer as a list of bytes objects, without joining them."""
+        return self.__chunks
 
     def to_bytes(self):
-        return self.__data
+        if len(self.__chunks) != 1:
+            self.__chunks = [b"".join(self.__chunks)]
+        return self.__chunks[0]
 
     def to_embed_string(self):
         return "data:application/octet-stream;base64," + base64.b64encode(
-            self.__data
+            self.to_bytes()
         ).decode("ascii")
 
     def clear(self):
-        self.__data = b""
+        self.__chunks = []
+        self.__byte_length = 0
+        self.__blocks = {}
 
 
 class AsoboBufferViews:
@@ -182,13 +300,62 @@ class AsoboBufferViews:
         self.BufferViews = []
 
         self.Meshes = (
-            []
+            set()
         )  # Keep track of the meshes we have already handled (we need this since meshes can be shared across objects, and we don't want to handle a mesh twice)
 
-    def traverse_scenes(self, scenes):
+    def traverse_scenes(self, scenes, max_workers=1):
+        """
+        Packs the meshes of all scenes into the buffer views.
+
+        :param scenes: a list of glTF scenes
+        :param max_workers: the amount of threads used to pack meshes. If this is None, the default of ThreadPoolExecutor is used. The packed meshes
+        are always merged into the buffer views in traversal order, so the output doesn't depend on the amount of threads.
+        """
+        meshes = []
         for scene in scenes:
             for node in scene.nodes:
-                self.__traverse_node(node, lambda node: self.__handle_node(node))
+                self.__traverse_node(
+                    node, lambda node: self.__handle_node(node, meshes)
+                )
+
+        if max_workers == 1:
+            for mesh, is_skinned in meshes:
+                self.merge_mesh(AsoboBufferViews.pack_mesh(mesh, is_skinned))
+        else:
+            # Most of the packing time is spent in numpy, which releases the GIL. Merging has to happen in order, since it assigns the offsets
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for blocks in executor.map(
+                    lambda mesh: AsoboBufferViews.pack_mesh(*mesh), meshes
+                ):
+                    self.merge_mesh(blocks)
+
+        bytes_saved = sum(
+            buffer_view.buffer.bytes_saved for buffer_view in self.BufferViews
+        )
+        if bytes_saved > 0:
+            print_console(
+                "INFO",
+                "Deduplicated identical vertex and index blocks, saved {} bytes".format(
+                    bytes_saved
+                ),
+            )
+
+    @staticmethod
+    def move_to_buffer(buffer_views, buffer):
+        """
+        Moves the data of packed buffer views into a glTF buffer, and points the buffer views to it.
+
+        :param buffer_views: the buffer views of an AsoboBufferViews. Their Asobo buffers are cleared afterwards
+        :param buffer: the gltf2_io_buffer.Buffer the data is added to
+        """
+        for buffer_view in buffer_views:
+            # Hand the chunks over to the glTF buffer without copying them, then release them from the Asobo buffer
+            asobo_buffer = buffer_view.buffer
+            offset = buffer.add_chunks(asobo_buffer.chunks)
+            buffer_view.buffer = 0
+            buffer_view.byte_length = asobo_buffer.byte_length
+            buffer_view.byte_offset = offset
+            asobo_buffer.clear()
 
     def __traverse_node(self, node, f):
         f(node)
@@ -196,15 +363,15 @@ class AsoboBufferViews:
             for child in node.children:
                 self.__traverse_node(child, f)
 
-    def __handle_node(self, node):
+    def __handle_node(self, node, meshes):
         if node.mesh is not None:
             if node.mesh not in self.Meshes:
-                self.Meshes.append(node.mesh)
+                self.Meshes.add(node.mesh)
                 is_skinned_mesh = any(
                     "BLEND" in primitive.extras["ASOBO_primitive"]["VertexType"]
                     for primitive in node.mesh.primitives
                 )
-                self.__handle_mesh(node.mesh, is_skinned_mesh)
+                meshes.append((node.mesh, is_skinned_mesh))
 
     @staticmethod
     def get_primitive_attributes_count(primitive):
@@ -218,61 +385,140 @@ class AsoboBufferViews:
         else:
             raise RuntimeError("Not all attributes of primitive have the same count")
 
+    @staticmethod
+    def get_accessor_bounds(accessor):
+        """
+        Returns the min and max values of an accessor. The accessor's own min and max are used if they are set.
+
+        :param accessor: a glTF accessor with a numpy array as buffer view
+        :return (min, max): two lists with a value per component
+        """
+        if accessor.min is not None and accessor.max is not None:
+            return accessor.min, accessor.max
+        data = np.asarray(accessor.buffer_view)
+        return np.amin(data, axis=0).tolist(), np.amax(data, axis=0).tolist()
+
+    @staticmethod
+    def set_vertex_byte_offsets(attributes, vertex_dtype, offset):
+        """
+        Sets the byte offset of every attribute stored in an interleaved vertex layout.
+
+        :param attributes: a dictionary of glTF accessors, keyed by attribute name
+        :param vertex_dtype: a numpy structured dtype, with one field per attribute
+        :param offset: the byte offset of the first vertex in the buffer
+        """
+        for attribute, accessor in attributes.items():
+            if attribute not in vertex_dtype.names:
+                continue
+            byte_offset = offset + vertex_dtype.fields[attribute][1]
+            if byte_offset != 0:
+                accessor.byte_offset = byte_offset
+
+    @staticmethod
+    def pack_vertices(attributes, vertex_dtype, count):
+        """
+        Interleaves the attribute data of a primitive into the vertex layout described by vertex_dtype.
+
+        :param attributes: a dictionary of glTF accessors, keyed by attribute name
+        :param vertex_dtype: a numpy structured dtype, with one field per attribute
+        :param count: the amount of vertices to pack
+        :return: the packed vertices as bytes
+        """
+        vertices = np.zeros(count, dtype=vertex_dtype)
+        for attribute, accessor in attributes.items():
+            if attribute not in vertex_dtype.names:
+                continue
+            field_shape = vertex_dtype.fields[attribute][0].shape
+            vertices[attribute] = np.asarray(accessor.buffer_view).reshape(
+                (count,) + field_shape
+            )
+        return vertices.tobytes()
+
     @staticmethod
     def split_indices(indices, base_vertex_index):
         """
-        Splits an array of indices so that no value is greater than SPLIT_INDEX. To do this, we group indices that are close to each other and calculate
-        a base_vertex_index.
+        Splits an array of indices so that no value is greater than SPLIT_INDEX. To do this, we group triangles that are close to each other into
+        windows and calculate a base_vertex_index for each window.
+
+        Triangles are sorted by their minimum index, and assigned to windows in a single sweep. Each window starts at the minimum index of its first
+        triangle, and takes following triangles until one's maximum index doesn't fit in the window. A single triangle with a large span can end a
+        window early, so this doesn't always give the smallest possible amount of windows.
+        Triangles that span more than SPLIT_INDEX can't fit in any window, so their vertices are remapped to new vertices that are appended after the
+        existing ones.
 
         :param indices: a numpy array
         :param base_vertex_index: an int or None
-        :return (split_indices, base_vertex_index): split_indices is a list of dictionaries in the following format: ['indices': [], 'base_vertex_index': int or None]. base_vertex_index is
-        our final base vertex index, and is the greatest out of those in split_indices.
+        :return (split_indices, base_vertex_index): split_indices is a list of dictionaries in the following format: ['indices': [], 'base_vertex_index': int or None,
+        'duplicated_vertices': [] or None]. duplicated_vertices holds the (relative) vertex indices that need to be appended to the vertex data for this chunk.
+        base_vertex_index is our final base vertex index, and is the greatest out of those in split_indices.
         """
+        base = 0 if base_vertex_index is None else base_vertex_index
+        vertex_count = int(np.amax(indices)) + 1
+
         # Group the indices into groups of 3
         indices_groups = indices.reshape(-1, 3)
+        group_min = np.amin(indices_groups, axis=1)
+        group_max = np.amax(indices_groups, axis=1)
+
+        fits = group_max - group_min <= SPLIT_INDEX
+        fitting_groups = np.flatnonzero(fits)
+
+        # Sort the triangles by their minimum index. The lowest base a triangle can use is its maximum index minus SPLIT_INDEX, and the highest base is
+        # its minimum index.
+        order = fitting_groups[np.argsort(group_min[fitting_groups], kind="stable")]
+        highest_base = group_min[order]
+        lowest_base = group_max[order] - SPLIT_INDEX
+        # Since triangles before a window's start all fit in earlier windows, the first triangle that doesn't fit in a window is the first one
+        # where the running maximum of lowest_base exceeds the window's base. The running maximum is sorted, so we can binary search it.
+        running_lowest_base = np.maximum.accumulate(lowest_base)
 
         split_indices = []
-        while (
-            len(indices_groups) > 0
-        ):  # This continues until every index group is properly split
-            # Subtract min_index from indices_groups
-            min_indices_groups = np.amin(indices_groups)
-
-            indices_groups -= min_indices_groups
-
-            # Add min index to base_vertex_index
-            if base_vertex_index is None:
-                if min_indices_groups != 0:
-                    base_vertex_index = min_indices_groups
-            else:
-                base_vertex_index += min_indices_groups
+        start = 0
+        while start < len(order):
+            window_base = int(highest_base[start])
+            end = int(np.searchsorted(running_lowest_base, window_base, side="right"))
 
-            # Check if we need to duplicate any indices
-            mask = (
-                np.amax(indices_groups, axis=1) - np.amin(indices_groups, axis=1)
-                > SPLIT_INDEX
-            )
-            overflow_indices = indices_groups[mask]
-            if len(overflow_indices) > 0:
-                if np.amin(overflow_indices) == 0:
-                    raise RuntimeError(
-                        "Index group cannot be split. You can try dividing the mesh into multiple meshes. This will be fixed in a future version of the exporter."
-                    )
+            # Keep the original order of triangles within a window
+            window_groups = np.sort(order[start:end])
+            indices_chunk = (indices_groups[window_groups] - window_base).flatten()
 
-            # Create a boolean mask to select indices that can fit into our current "chunk"
-            mask = np.amax(indices_groups, axis=1) <= SPLIT_INDEX
-            indices_chunk = indices_groups[
-                mask
-            ].flatten()  # We want to flatten this since we paired the indices into groups of 3
+            if base_vertex_index is None and window_base == 0:
+                chunk_base_vertex_index = None
+            else:
+                chunk_base_vertex_index = base + window_base
+
+            split_indices.append(
+                {
+                    "indices": indices_chunk,
+                    "base_vertex_index": chunk_base_vertex_index,
+                    "duplicated_vertices": None,
+                }
+            )
+            start = end
+
+        # Triangles that don't fit in any window get their own vertices. Limit the amount of triangles per chunk so that the local indices always fit.
+        spanning_groups = indices_groups[~fits]
+        max_groups_per_chunk = (SPLIT_INDEX + 1) // 3
+        duplicated_base = vertex_count
+        for chunk_start in range(0, len(spanning_groups), max_groups_per_chunk):
+            groups_chunk = spanning_groups[
+                chunk_start : chunk_start + max_groups_per_chunk
+            ]
+            duplicated_vertices, indices_chunk = np.unique(
+                groups_chunk, return_inverse=True
+            )
 
-            # Remove the indices that we used by setting indices_groups to the opposite of our boolean mask
-            indices_groups = indices_groups[~mask]
+            split_indices.append(
+                {
+                    "indices": indices_chunk.reshape(-1),
+                    "base_vertex_index": base + duplicated_base,
+                    "duplicated_vertices": duplicated_vertices,
+                }
+            )
+            duplicated_base += len(duplicated_vertices)
 
-            if len(indices_chunk) > 0:
-                split_indices.append(
-                    {"indices": indices_chunk, "base_vertex_index": base_vertex_index}
-                )
+        if split_indices:
+            base_vertex_index = split_indices[-1]["base_vertex_index"]
 
         return split_indices, base_vertex_index
 
@@ -284,25 +530,54 @@ class AsoboBufferViews:
 
         :param primitive: a glTF primitive
         :param is_skinned: if the mesh is skinned
-        :return (split_primitives, base_vertex_index): split_primitives is a list of glTF primitives, and base_vertex_index is our greatest base vertex index out of
-        all the split primitives.
+        :return (split_primitives, base_vertex_index, duplicated_vertex_count): split_primitives is a list of glTF primitives, base_vertex_index is our greatest
+        base vertex index out of all the split primitives, and duplicated_vertex_count is the amount of vertices that were appended to the primitive's vertex data.
         """
-        # The first step in splitting the primitive is arranging the indices in numerical order, as they are gathered in an arbitrary order
         indices = primitive.indices.buffer_view
 
         split_indices, base_vertex_index = AsoboBufferViews.split_indices(
             indices, primitive.extras["ASOBO_primitive"]["BaseVertexIndex"]
         )
 
+        # Append the vertices used by remapped triangles to the vertex data. This has to be done before the attributes are copied for the split primitives.
+        duplicated = [
+            v["duplicated_vertices"]
+            for v in split_indices
+            if v["duplicated_vertices"] is not None
+        ]
+        duplicated_vertex_count = 0
+        if duplicated:
+            # Vertex indices are relative to the first vertex of the primitive's data, after subtracting the base vertex index
+            first_vertex = (
+                int(np.amax(indices)) + 1 - primitive.attributes["POSITION"].count
+            )
+            duplicated = np.concatenate(duplicated) - first_vertex
+            duplicated_vertex_count = len(duplicated)
+            for attribute in primitive.attributes.values():
+                data = np.asarray(attribute.buffer_view)
+                attribute.buffer_view = np.concatenate((data, data[duplicated]))
+                attribute.count = len(attribute.buffer_view)
+
+        duplicated_per_chunk = [
+            0 if v["duplicated_vertices"] is None else len(v["duplicated_vertices"])
+            for v in split_indices
+        ]
+        print_console(
+            "INFO",
+            "Split primitive into {} chunks, duplicated vertices per chunk: {}".format(
+                len(split_indices), duplicated_per_chunk
+            ),
+        )
+
         # Now we split this new primitive that we've made
         split_primitives = []
 
         for i, v in enumerate(split_indices):
-            # v is a dictionary with 2 keys - indices and base_vertex_index
+            # v is a dictionary with 3 keys - indices, base_vertex_index and duplicated_vertices
 
             if (
-                max(v["indices"]) > SPLIT_INDEX
-            ):  # There is a chance that our indices may not have been completely split. If that's the case, raise an error
+                np.amax(v["indices"]) > SPLIT_INDEX
+            ):  # This should never happen, but make sure that our indices have been completely split. If that's not the case, raise an error
                 raise RuntimeError("Couldn't split indices for primitive")
 
             # Create the indices accessor and the primitive
@@ -353,9 +628,20 @@ class AsoboBufferViews:
 
             split_primitives.append(split_primitive)
 
-        return split_primitives, base_vertex_index
+        return split_primitives, base_vertex_index, duplicated_vertex_count
 
-    def __handle_mesh(self, mesh, is_skinned):
+    @staticmethod
+    def pack_mesh(mesh, is_skinned):
+        """
+        Splits the primitives of a mesh and packs their index and vertex data into the layouts used by the sim. This only works on the mesh itself, so
+        meshes can be packed in parallel. The packed blocks are added to the buffer views by merge_mesh.
+
+        :param mesh: a glTF mesh
+        :param is_skinned: if the mesh is skinned
+        :return: a list of dictionaries in the following format, in the order they need to be added to the buffer views: ['buffer_view': str,
+        'data': bytes, 'check_padding': bool, 'vertex_dtype': numpy dtype or None, 'accessors': glTF accessor or dictionary of glTF accessors].
+        vertex_dtype is None for index blocks.
+        """
         # Before processing the mesh data, we check if we need to split any primitives
         max_index = 0
         base_vertex_index = None
@@ -367,7 +653,10 @@ class AsoboBufferViews:
             )  # Convert the buffer view dtype to a python int. This prevents overflow. While we could use something like np.uint64, it's probably safer to use a python int. We later convert this to uint16
             if not is_skinned:
                 primitive.indices.buffer_view += max_index
-                max_index = max(primitive.indices.buffer_view) + 1
+                max_index = int(np.amax(primitive.indices.buffer_view)) + 1
+            else:
+                # Skinned primitives each have their own vertex data, so the base vertex index of a previous primitive doesn't apply
+                base_vertex_index = None
 
             # Subtract base vertex index from our indices
             if base_vertex_index is not None:
@@ -377,17 +666,22 @@ class AsoboBufferViews:
                 )
 
             # Only split primitive if needed
-            if max(primitive.indices.buffer_view) > SPLIT_INDEX:
-                split_primitives, base_vertex_index = AsoboBufferViews.split_primitive(
-                    primitive, is_skinned
-                )
+            if np.amax(primitive.indices.buffer_view) > SPLIT_INDEX:
+                (
+                    split_primitives,
+                    base_vertex_index,
+                    duplicated_vertex_count,
+                ) = AsoboBufferViews.split_primitive(primitive, is_skinned)
                 new_primitives.extend(split_primitives)
+                max_index += duplicated_vertex_count
             else:
                 new_primitives.append(primitive)
 
         # Finally, overwrite the mesh primitives to our new ones.
         mesh.primitives = new_primitives
 
+        blocks = []
+
         if is_skinned:
             for i, primitive in enumerate(mesh.primitives):
 
@@ -395,37 +689,24 @@ class AsoboBufferViews:
                 # Gather indices
                 #
 
-                indices = (
-                    []
-                )  # Use a regular python list as appending is faster than using numpy
-
-                # Reverse indices (this makes the faces render in the correct direction)
-                for i in range(0, len(primitive.indices.buffer_view), 3):
-                    indices.append(primitive.indices.buffer_view[i + 2])
-                    indices.append(primitive.indices.buffer_view[i + 1])
-                    indices.append(primitive.indices.buffer_view[i + 0])
-
                 indices_accessor = primitive.indices
 
-                # Set data type
+                # Reverse indices (this makes the faces render in the correct direction), and set data type
                 dtype = gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(
                     indices_accessor.component_type
                 )
-                indices = np.array(indices, dtype=dtype)
-
-                binary_data = gltf2_io_binary_data.BinaryData(indices.tobytes())
-                offset = self.BufferViewIndex.buffer.append_data(
-                    binary_data, check_padding=True, calculate_offset=True
-                )
-                if self.BufferViewIndex not in self.BufferViews:
-                    self.BufferViews.append(self.BufferViewIndex)
+                indices = reverse_winding(indices_accessor.buffer_view, dtype=dtype)
 
-                indices_accessor.buffer_view = self.BufferViews.index(
-                    self.BufferViewIndex
-                )
-                if offset != 0:
-                    indices_accessor.byte_offset = offset
                 indices_accessor.name = f"{mesh.name}_indices#{i}"
+                blocks.append(
+                    {
+                        "buffer_view": "BufferViewIndex",
+                        "data": indices.tobytes(),
+                        "check_padding": True,
+                        "vertex_dtype": None,
+                        "accessors": indices_accessor,
+                    }
+                )
 
                 #
                 # Set mesh data
@@ -434,168 +715,65 @@ class AsoboBufferViews:
                 is_blend4 = (
                     primitive.extras["ASOBO_primitive"]["VertexType"] == "BLEND4"
                 )
-                blend_buffer_view = (
-                    self.BufferViewVertex4Blend
-                    if is_blend4
-                    else self.BufferViewVertex1Blend
-                )
-                expected_byte_stride = 48 if is_blend4 else 44
+                vertex_dtype = VERTEX_BLEND4_DTYPE if is_blend4 else VERTEX_BLEND1_DTYPE
 
                 # Get amount of elements we want to add into the buffer
                 count = AsoboBufferViews.get_primitive_attributes_count(primitive)
 
-                buffer = bytearray(
-                    expected_byte_stride * count
-                )  # could possibly cause an error? might need to multiply by 3
-
-                # Assign offsets
-                offset = blend_buffer_view.buffer.byte_length
-
-                if "POSITION" in primitive.attributes:
-                    if offset != 0:
-                        primitive.attributes["POSITION"].byte_offset = offset
-                if "TANGENT" in primitive.attributes:
-                    primitive.attributes["TANGENT"].byte_offset = offset + 12
-                if "NORMAL" in primitive.attributes:
-                    primitive.attributes["NORMAL"].byte_offset = offset + 16
-                if "TEXCOORD_0" in primitive.attributes:
-                    primitive.attributes["TEXCOORD_0"].byte_offset = offset + 20
-                if "TEXCOORD_1" in primitive.attributes:
-                    primitive.attributes["TEXCOORD_1"].byte_offset = offset + 24
-                if "JOINTS_0" in primitive.attributes:
-                    primitive.attributes["JOINTS_0"].byte_offset = offset + 28
-                if "WEIGHTS_0" in primitive.attributes:
-                    primitive.attributes["WEIGHTS_0"].byte_offset = offset + 36
-                if "COLOR_0" in primitive.attributes:
-                    if is_blend4:
-                        primitive.attributes["COLOR_0"].byte_offset = offset + 44
-                    else:
-                        primitive.attributes["COLOR_0"].byte_offset = offset + 40
-
-                for vidx in range(count):
-                    start = vidx * expected_byte_stride
-
-                    # Pack data into buffer
-
-                    if "POSITION" in primitive.attributes:
-                        STRUCT_POSITION.pack_into(
-                            buffer,
-                            start,
-                            *primitive.attributes["POSITION"].buffer_view[vidx],
-                        )
-                    if "TANGENT" in primitive.attributes:
-                        STRUCT_TANGENT.pack_into(
-                            buffer,
-                            start + 12,
-                            *primitive.attributes["TANGENT"].buffer_view[vidx],
-                        )
-                    if "NORMAL" in primitive.attributes:
-                        STRUCT_NORMAL.pack_into(
-                            buffer,
-                            start + 16,
-                            *primitive.attributes["NORMAL"].buffer_view[vidx],
-                        )
-                    if "TEXCOORD_0" in primitive.attributes:
-                        STRUCT_UV.pack_into(
-                            buffer,
-                            start + 20,
-                            *primitive.attributes["TEXCOORD_0"].buffer_view[vidx],
-                        )
-                    if "TEXCOORD_1" in primitive.attributes:
-                        STRUCT_UV.pack_into(
-                            buffer,
-                            start + 24,
-                            *primitive.attributes["TEXCOORD_1"].buffer_view[vidx],
-                        )
-                    if "JOINTS_0" in primitive.attributes:
-                        STRUCT_JOINT.pack_into(
-                            buffer,
-                            start + 28,
-                            *primitive.attributes["JOINTS_0"].buffer_view[vidx],
-                        )
-                    if "WEIGHTS_0" in primitive.attributes:
-                        if is_blend4:
-                            STRUCT_WEIGHT4.pack_into(
-                                buffer,
-                                start + 36,
-                                *primitive.attributes["WEIGHTS_0"].buffer_view[vidx],
-                            )
-                        else:
-                            STRUCT_WEIGHT1.pack_into(
-                                buffer,
-                                start + 36,
-                                *primitive.attributes["WEIGHTS_0"].buffer_view[vidx],
-                            )
-                    if "COLOR_0" in primitive.attributes:
-                        if is_blend4:
-                            STRUCT_COLOR_BLEND.pack_into(
-                                buffer,
-                                start + 44,
-                                *primitive.attributes["COLOR_0"].buffer_view[vidx],
-                            )
-                        else:
-                            STRUCT_COLOR_BLEND.pack_into(
-                                buffer,
-                                start + 40,
-                                *primitive.attributes["COLOR_0"].buffer_view[vidx],
-                            )
-
-                blend_buffer_view.buffer.append_bytes(
-                    bytes(buffer), calculate_offset=False
-                )
-                if blend_buffer_view not in self.BufferViews:
-                    self.BufferViews.append(blend_buffer_view)
-
-                # Set attribute names and  buffer view indexes
+                # Set attribute names
                 for attribute in primitive.attributes:
-                    primitive.attributes[
-                        attribute
-                    ].buffer_view = self.BufferViews.index(blend_buffer_view)
                     primitive.attributes[
                         attribute
                     ].name = f"{mesh.name}_vertices#0_{attribute}"
 
+                # Pack data
+                blocks.append(
+                    {
+                        "buffer_view": (
+                            "BufferViewVertex4Blend"
+                            if is_blend4
+                            else "BufferViewVertex1Blend"
+                        ),
+                        "data": AsoboBufferViews.pack_vertices(
+                            primitive.attributes, vertex_dtype, count
+                        ),
+                        "check_padding": False,
+                        "vertex_dtype": vertex_dtype,
+                        "accessors": primitive.attributes,
+                    }
+                )
+
         else:  # Mesh is not skinned
 
             #
             # Gather indices
             #
 
-            all_indices = (
-                []
-            )  # Use a regular python list as appending is faster than using numpy
-
-            # Reverse indices (this makes the faces render in the correct direction)
-            for primitive in mesh.primitives:
-                indices = primitive.indices.buffer_view
-
-                for i in range(0, len(indices), 3):
-                    all_indices.append(indices[i + 2])
-                    all_indices.append(indices[i + 1])
-                    all_indices.append(indices[i + 0])
-
             primitive = mesh.primitives[0]  # use first primitive
             indices_accessor = primitive.indices
 
-            # Convert to numpy array
+            # Reverse indices (this makes the faces render in the correct direction), and set data type
             dtype = gltf2_io_constants.ComponentType.to_numpy_dtype_asobo(
                 indices_accessor.component_type
             )
-            all_indices = np.array(all_indices, dtype=dtype)
-
-            # Set binary data and append to buffer view
-            binary_data = gltf2_io_binary_data.BinaryData(all_indices.tobytes())
-            offset = self.BufferViewIndex.buffer.append_data(
-                binary_data, check_padding=True, calculate_offset=True
+            all_indices = np.concatenate(
+                [
+                    reverse_winding(primitive.indices.buffer_view, dtype=dtype)
+                    for primitive in mesh.primitives
+                ]
             )
-            if self.BufferViewIndex not in self.BufferViews:
-                self.BufferViews.append(self.BufferViewIndex)
 
-            indices_accessor.buffer_view = self.BufferViews.index(self.BufferViewIndex)
-            if offset != 0:
-                indices_accessor.byte_offset = offset
             indices_accessor.count = len(all_indices)
             indices_accessor.name = f"{mesh.name}_indices#{len(mesh.primitives) - 1}"
+            blocks.append(
+                {
+                    "buffer_view": "BufferViewIndex",
+                    "data": all_indices.tobytes(),
+                    "check_padding": True,
+                    "vertex_dtype": None,
+                    "accessors": indices_accessor,
+                }
+            )
 
             #
             # Share accessors between the primitives
@@ -606,25 +784,36 @@ class AsoboBufferViews:
                 accessor = mesh.primitives[0].attributes[
                     attribute
                 ]  # Share the first primitive's accessors
-                buffer_views = []
-                for primitive in mesh.primitives:
-                    if attribute in primitive.attributes:
-                        if primitive.attributes[attribute].buffer_view is not None:
-                            buffer_views.extend(
-                                primitive.attributes[attribute].buffer_view
-                            )  # Add other primitive's data into the accessor
-                accessor.buffer_view = buffer_views
-                accessor.count = len(buffer_views)  # Recalculate the count
+                primitive_accessors = [
+                    primitive.attributes[attribute]
+                    for primitive in mesh.primitives
+                    if attribute in primitive.attributes
+                    and primitive.attributes[attribute].buffer_view is not None
+                ]  # Add other primitive's data into the accessor
 
                 if (
                     attribute == "POSITION"
-                ):  # Since we've put all the data into a shared accessor, we need to also recalculate the position accessor's min and max values
-                    accessor.min = list(
-                        map(float, np.amin(buffer_views, axis=0).tolist())
+                ):  # Since we've put all the data into a shared accessor, we need to also recalculate the position accessor's min and max values. We can combine the bounds of each primitive instead of going over the vertices again
+                    bounds = [
+                        AsoboBufferViews.get_accessor_bounds(a)
+                        for a in primitive_accessors
+                    ]
+                    accessor.min = [
+                        float(v) for v in np.amin([b[0] for b in bounds], axis=0)
+                    ]
+                    accessor.max = [
+                        float(v) for v in np.amax([b[1] for b in bounds], axis=0)
+                    ]
+
+                if len(primitive_accessors) == 1:
+                    accessor.buffer_view = np.asarray(
+                        primitive_accessors[0].buffer_view
                     )
-                    accessor.max = list(
-                        map(float, np.amax(buffer_views, axis=0).tolist())
+                else:
+                    accessor.buffer_view = np.concatenate(
+                        [np.asarray(a.buffer_view) for a in primitive_accessors]
                     )
+                accessor.count = len(accessor.buffer_view)  # Recalculate the count
 
                 for (
                     primitive
@@ -635,92 +824,28 @@ class AsoboBufferViews:
             # Set mesh data
             #
 
-            vertex_nd_buffer_view = self.BufferViewVertexND
-            expected_byte_stride = 36
-
             # Get amount of elements we want to add into the buffer
             count = AsoboBufferViews.get_primitive_attributes_count(primitive)
 
-            # Create an empty buffer with the expected size
-            buffer = bytearray(
-                expected_byte_stride * count
-            )  # could possibly cause an error? might need to multiply by 3
-
-            # Assign offsets
-            offset = vertex_nd_buffer_view.buffer.byte_length
-
-            if "POSITION" in primitive.attributes:
-                if offset != 0:
-                    primitive.attributes["POSITION"].byte_offset = offset
-            if "TANGENT" in primitive.attributes:
-                primitive.attributes["TANGENT"].byte_offset = offset + 12
-            if "NORMAL" in primitive.attributes:
-                primitive.attributes["NORMAL"].byte_offset = offset + 16
-            if "TEXCOORD_0" in primitive.attributes:
-                primitive.attributes["TEXCOORD_0"].byte_offset = offset + 20
-            if "TEXCOORD_1" in primitive.attributes:
-                primitive.attributes["TEXCOORD_1"].byte_offset = offset + 24
-            if "COLOR_0" in primitive.attributes:
-                primitive.attributes["COLOR_0"].byte_offset = offset + 28
-
-            for vidx in range(count):
-                start = vidx * expected_byte_stride
-
-                # Pack data into buffer
-
-                if "POSITION" in primitive.attributes:
-                    STRUCT_POSITION.pack_into(
-                        buffer,
-                        start,
-                        *primitive.attributes["POSITION"].buffer_view[vidx],
-                    )
-                if "TANGENT" in primitive.attributes:
-                    STRUCT_TANGENT.pack_into(
-                        buffer,
-                        start + 12,
-                        *primitive.attributes["TANGENT"].buffer_view[vidx],
-                    )
-                if "NORMAL" in primitive.attributes:
-                    STRUCT_NORMAL.pack_into(
-                        buffer,
-                        start + 16,
-                        *primitive.attributes["NORMAL"].buffer_view[vidx],
-                    )
-                if "TEXCOORD_0" in primitive.attributes:
-                    STRUCT_UV.pack_into(
-                        buffer,
-                        start + 20,
-                        *primitive.attributes["TEXCOORD_0"].buffer_view[vidx],
-                    )
-                if "TEXCOORD_1" in primitive.attributes:
-                    STRUCT_UV.pack_into(
-                        buffer,
-                        start + 24,
-                        *primitive.attributes["TEXCOORD_1"].buffer_view[vidx],
-                    )
-                if "COLOR_0" in primitive.attributes:
-                    STRUCT_COLOR_VTX.pack_into(
-                        buffer,
-                        start + 28,
-                        *primitive.attributes["COLOR_0"].buffer_view[vidx],
-                    )
-
-            # Add data to the buffer view
-            vertex_nd_buffer_view.buffer.append_bytes(
-                bytes(buffer), calculate_offset=False
-            )
-            if vertex_nd_buffer_view not in self.BufferViews:
-                self.BufferViews.append(vertex_nd_buffer_view)
-
-            # Set attribute buffer view index
+            # Set attribute names
             for attribute in primitive.attributes:
-                primitive.attributes[attribute].buffer_view = self.BufferViews.index(
-                    vertex_nd_buffer_view
-                )
                 primitive.attributes[
                     attribute
                 ].name = f"{mesh.name}_vertices#0_{attribute}"
 
+            # Pack data
+            blocks.append(
+                {
+                    "buffer_view": "BufferViewVertexND",
+                    "data": AsoboBufferViews.pack_vertices(
+                        primitive.attributes, VERTEX_ND_DTYPE, count
+                    ),
+                    "check_padding": False,
+                    "vertex_dtype": VERTEX_ND_DTYPE,
+                    "accessors": primitive.attributes,
+                }
+            )
+
             #
             # Distribute the shared accessors between all the primitives
             #
@@ -741,3 +866,34 @@ class AsoboBufferViews:
                 total_asobo_primitive_count += mesh_primitive.extras["ASOBO_primitive"][
                     "PrimitiveCount"
                 ]
+
+        return blocks
+
+    def merge_mesh(self, blocks):
+        """
+        Adds the blocks of a packed mesh to the buffer views, and points the mesh's accessors to them.
+
+        :param blocks: a list of blocks, as returned by pack_mesh
+        """
+        for block in blocks:
+            buffer_view = getattr(self, block["buffer_view"])
+
+            offset = buffer_view.buffer.append_unique_bytes(
+                block["data"], check_padding=block["check_padding"]
+            )
+            if buffer_view not in self.BufferViews:
+                self.BufferViews.append(buffer_view)
+            buffer_view_index = self.BufferViews.index(buffer_view)
+
+            if block["vertex_dtype"] is None:  # Index block
+                indices_accessor = block["accessors"]
+                indices_accessor.buffer_view = buffer_view_index
+                if offset != 0:
+                    indices_accessor.byte_offset = offset
+            else:
+                # Assign offsets and buffer view indexes
+                AsoboBufferViews.set_vertex_byte_offsets(
+                    block["accessors"], block["vertex_dtype"], offset
+                )
+                for accessor in block["accessors"].values():
+                    accessor.buffer_view = buffer_view_index
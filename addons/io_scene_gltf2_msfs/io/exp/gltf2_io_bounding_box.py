@@ -0,0 +1,43 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+class BoundingBox:
+    """Accumulates the bounds of all vertices of an export, for the ASOBO_asset_optimized extension."""
+
+    def __init__(self):
+        # Start from an empty box at 0, like the export always did, so the bounding box always contains the origin
+        self.__min = np.zeros(3)
+        self.__max = np.zeros(3)
+
+    def add(self, positions):
+        """
+        Extends the bounding box to contain all positions.
+
+        :param positions: a numpy array of shape (n, 3)
+        """
+        if len(positions) == 0:
+            return
+        np.minimum(self.__min, np.amin(positions, axis=0), out=self.__min)
+        np.maximum(self.__max, np.amax(positions, axis=0), out=self.__max)
+
+    @property
+    def min(self):
+        return [float(v) for v in self.__min]
+
+    @property
+    def max(self):
+        return [float(v) for v in self.__max]
@@ -22,21 +22,30 @@ class Buffer:
     """Class representing binary data for use in a glTF file as 'buffer' property."""
 
     def __init__(self, buffer_index=0):
-        self.__data = bytearray(b"")
+        # Data is kept as a list of chunks, so that appending never copies previously added data
+        self.__chunks = []
+        self.__byte_length = 0
         self.__buffer_index = buffer_index
 
+    def __append(self, data):
+        self.__chunks.append(data)
+        self.__byte_length += len(data)
+
+    def __pad(self, length):
+        # offsets should be a multiple of 4 --> therefore add padding if necessary
+        padding = (4 - (length % 4)) % 4
+        if padding != 0:
+            self.__append(b"\x00" * padding)
+
     def add_and_get_view(
         self, binary_data: gltf2_io_binary_data.BinaryData
     ) -> gltf2_io.BufferView:
         """Add binary data to the buffer. Return a glTF BufferView."""
-        offset = len(self.__data)
-        self.__data.extend(binary_data.data)
+        offset = self.__byte_length
+        self.__append(binary_data.data)
 
         length = binary_data.byte_length
-
-        # offsets should be a multiple of 4 --> therefore add padding if necessary
-        padding = (4 - (length % 4)) % 4
-        self.__data.extend(b"\x00" * padding)
+        self.__pad(length)
 
         buffer_view = gltf2_io.BufferView(
             buffer=self.__buffer_index,
@@ -50,28 +59,42 @@ class Buffer:
         )
         return buffer_view
 
-    def add(self, data) -> gltf2_io.BufferView:
-        """Add binary data to the buffer."""
-        offset = len(self.__data)
-        self.__data += data
+    def add(self, data) -> int:
+        """Add binary data to the buffer. Return the offset of the data."""
+        offset = self.__byte_length
+        self.__append(data)
+        self.__pad(len(data))
 
-        # offsets should be a multiple of 4 --> therefore add padding if necessary
-        padding = (4 - (len(data) % 4)) % 4
-        self.__data += b"\x00" * padding
+        return offset
+
+    def add_chunks(self, chunks) -> int:
+        """Add a list of bytes objects to the buffer without joining them. Return the offset of the first chunk."""
+        offset = self.__byte_length
+        for chunk in chunks:
+            self.__append(chunk)
+        self.__pad(self.__byte_length - offset)
 
         return offset
 
     @property
     def byte_length(self):
-        return len(self.__data)
+        return self.__byte_length
+
+    @property
+    def chunks(self):
+        """The data of the buffer as a list of bytes objects, without joining them."""
+        return self.__chunks
 
     def to_bytes(self):
-        return self.__data
+        if len(self.__chunks) != 1:
+            self.__chunks = [b"".join(self.__chunks)]
+        return self.__chunks[0]
 
     def to_embed_string(self):
         return "data:application/octet-stream;base64," + base64.b64encode(
-            self.__data
+            self.to_bytes()
         ).decode("ascii")
 
     def clear(self):
-        self.__data = b""
+        self.__chunks = []
+        self.__byte_length = 0
@@ -16,20 +16,43 @@
 # Imports
 #
 
-import json
+import collections
+import contextlib
+import itertools
+import os
+import stat
 import struct
+import tempfile
+
+from io_scene_gltf2_msfs.io.exp.gltf2_io_json import write_gltf_json
 
 #
 # Globals
 #
 
+GLB_HEADER = struct.Struct("<4sII")
+GLB_CHUNK_HEADER = struct.Struct("<I4s")
+
+# The umask can only be read by changing it, which affects the whole process. Read it once on import, before any export threads are started
+UMASK = os.umask(0)
+os.umask(UMASK)
+
 #
 # Functions
 #
-from collections import OrderedDict
 
 
-def save_gltf(gltf, export_settings, encoder, glb_buffer):
+def save_gltf(gltf, export_settings, encoder, buffer_chunks):
+    """
+    Write the glTF to file. The JSON is encoded while it is written, see write_gltf_json.
+
+    Every file is written to a temporary file first. The temporary files only replace the output files once all of them are complete, so an
+    export that fails halfway leaves the previous files intact.
+
+    :param gltf: the glTF as returned by Gltf.to_dict
+    :param encoder: a json.JSONEncoder class, whose default method is used for values the JSON encoder doesn't support
+    :param buffer_chunks: the chunks of the buffer to write to the GLB file or the separate .bin file
+    """
     indent = None
     separators = (",", ":")
 
@@ -38,90 +61,139 @@ def save_gltf(gltf, export_settings, encoder, glb_buffer):
         # The comma is typically followed by a newline, so no trailing whitespace is needed on it.
         separators = (",", ": ")
 
-    sort_order = [
-        "accessors",
-        "animations",
-        "asset",
-        "bufferViews",
-        "extensionsUsed",
-        "extensionsRequired",
-        "extensions",
-        "extras",
-        "materials",
-        "meshes",
-        "nodes",
-        "scene",
-        "scenes",
-        "skins",
-        "textures",
-        "buffers",
-        "images",
-        "cameras",
-        "samplers",
-    ]
-    gltf_ordered = OrderedDict(
-        sorted(gltf.items(), key=lambda item: sort_order.index(item[0]))
-    )
-    gltf_encoded = json.dumps(
-        gltf_ordered, indent=indent, separators=separators, cls=encoder, allow_nan=False
-    )
-
-    #
+    default = encoder(allow_nan=False).default
+
+    length_bin = sum(len(chunk) for chunk in buffer_chunks)
 
     if export_settings["gltf_format"] != "GLB":
-        file = open(
-            export_settings["gltf_filepath"], "w", encoding="utf8", newline="\n"
-        )
-        file.write(gltf_encoded)
-        file.write("\n")
-        file.close()
-
-        binary = export_settings["gltf_binary"]
-        if len(binary) > 0 and not export_settings["gltf_embed_buffers"]:
-            file = open(
-                export_settings["gltf_filedirectory"]
-                + export_settings["gltf_binaryfilename"],
-                "wb",
-            )
-            file.write(binary)
-            file.close()
+        with __replace_when_complete() as open_temporary:
+            if length_bin > 0:
+                with open_temporary(
+                    export_settings["gltf_filedirectory"]
+                    + export_settings["gltf_binaryfilename"],
+                    "wb",
+                ) as file:
+                    __write_chunks(file, buffer_chunks)
+
+            with open_temporary(
+                export_settings["gltf_filepath"], "w", encoding="utf8", newline="\n"
+            ) as file:
+                write_gltf_json(gltf, file.write, indent, separators, default)
+                file.write("\n")
 
     else:
-        file = open(export_settings["gltf_filepath"], "wb")
-
-        gltf_data = gltf_encoded.encode()
-        binary = glb_buffer
+        with __replace_when_complete() as open_temporary, open_temporary(
+            export_settings["gltf_filepath"], "wb"
+        ) as file:
+            # The JSON is streamed, so its length is only known once it's written. Leave room for the header and the JSON chunk header, and
+            # write them last
+            file.seek(GLB_HEADER.size + GLB_CHUNK_HEADER.size)
+
+            length_gltf = 0
+
+            def write_json(part):
+                nonlocal length_gltf
+                # The JSON is ASCII only, so its length in bytes is the length of the string
+                length_gltf += len(part)
+                file.write(part.encode())
+
+            write_gltf_json(gltf, write_json, indent, separators, default)
+
+            spaces_gltf = (4 - (length_gltf & 3)) & 3
+            length_gltf += spaces_gltf
+            file.write(b" " * spaces_gltf)
+
+            zeros_bin = (4 - (length_bin & 3)) & 3
+            length_bin += zeros_bin
+
+            length = GLB_HEADER.size + GLB_CHUNK_HEADER.size + length_gltf
+            if length_bin > 0:
+                length += GLB_CHUNK_HEADER.size + length_bin
+
+                # Chunk 1 (BIN)
+                __write_chunks(
+                    file,
+                    [GLB_CHUNK_HEADER.pack(length_bin, b"BIN\0")]
+                    + list(buffer_chunks)
+                    + [b"\0" * zeros_bin],
+                )
+
+            # Header (Version 2) and chunk 0 (JSON)
+            file.seek(0)
+            file.write(GLB_HEADER.pack(b"glTF", 2, length))
+            file.write(GLB_CHUNK_HEADER.pack(length_gltf, b"JSON"))
 
-        length_gltf = len(gltf_data)
-        spaces_gltf = (4 - (length_gltf & 3)) & 3
-        length_gltf += spaces_gltf
-
-        length_bin = len(binary)
-        zeros_bin = (4 - (length_bin & 3)) & 3
-        length_bin += zeros_bin
-
-        length = 12 + 8 + length_gltf
-        if length_bin > 0:
-            length += 8 + length_bin
-
-        # Header (Version 2)
-        file.write("glTF".encode())
-        file.write(struct.pack("I", 2))
-        file.write(struct.pack("I", length))
-
-        # Chunk 0 (JSON)
-        file.write(struct.pack("I", length_gltf))
-        file.write("JSON".encode())
-        file.write(gltf_data)
-        file.write(b" " * spaces_gltf)
+    return True
 
-        # Chunk 1 (BIN)
-        if length_bin > 0:
-            file.write(struct.pack("I", length_bin))
-            file.write("BIN\0".encode())
-            file.write(binary)
-            file.write(b"\0" * zeros_bin)
 
-        file.close()
+@contextlib.contextmanager
+def __replace_when_complete():
+    """
+    Yield a function that opens a temporary file next to an output path. The temporary files replace their output paths once the block is
+    left without an error, otherwise they are removed and the output files are left as they were.
+    """
+    temporary_paths = {}
 
-    return True
+    def open_temporary(path, mode, **kwargs):
+        fd, temporary_path = tempfile.mkstemp(
+            prefix="." + os.path.basename(path) + ".",
+            suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(path)),
+        )
+        temporary_paths[path] = temporary_path
+        return open(fd, mode, **kwargs)
+
+    try:
+        yield open_temporary
+
+        for path, temporary_path in temporary_paths.items():
+            os.chmod(temporary_path, __get_output_mode(path))
+        for path in list(temporary_paths):
+            os.replace(temporary_paths.pop(path), path)
+    finally:
+        for temporary_path in temporary_paths.values():
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+
+def __get_output_mode(path):
+    # mkstemp creates files that only the user can read. Keep the permissions of the file that is replaced, or use those of a regular new file
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~UMASK
+
+
+def __write_chunks(file, chunks):
+    """Write a list of bytes objects to a binary file without joining them, using vectored I/O where available."""
+    if not hasattr(os, "writev"):
+        for chunk in chunks:
+            file.write(chunk)
+        return
+
+    file.flush()
+    fd = file.fileno()
+    try:
+        iov_max = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        iov_max = 1024
+    if iov_max <= 0:
+        iov_max = 1024
+
+    pending = collections.deque(memoryview(chunk) for chunk in chunks if len(chunk))
+    while pending:
+        written = os.writev(fd, list(itertools.islice(pending, iov_max)))
+        # writev can write less than requested, continue after the last written byte
+        while written > 0:
+            chunk = pending[0]
+            if written >= chunk.nbytes:
+                written -= chunk.nbytes
+                pending.popleft()
+            else:
+                pending[0] = chunk.cast("B")[written:]
+                written = 0
+
+    # The file object doesn't know about the data written to its descriptor
+    file.seek(0, os.SEEK_END)
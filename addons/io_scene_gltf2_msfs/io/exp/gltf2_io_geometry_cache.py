@@ -0,0 +1,142 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from io_scene_gltf2_msfs.io.com.gltf2_io_debug import print_console
+
+# Increase this whenever the format of the entries changes. Changes to the extracted primitives don't need it, since the code that extracts
+# them is part of the keys
+CACHE_VERSION = 1
+METADATA_FILENAME = "primitives.json"
+
+
+class GeometryCache:
+    """
+    An on-disk cache of extracted mesh primitives, keyed by a digest of everything the extraction depends on.
+
+    Every entry is a directory with one .npy file per array and a JSON file with the rest of the primitives. Arrays are memory-mapped copy on
+    write when they are loaded, so unchanged meshes are read lazily and can still be modified by the rest of the export.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.__used_keys = set()
+
+    def load(self, key):
+        """
+        Loads the primitives stored for key.
+
+        :return: a list of primitives in the format of extract_primitives, or None if there is no valid entry for key
+        """
+        entry_directory = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(entry_directory, METADATA_FILENAME), "r") as f:
+                metadata = json.load(f)
+            if metadata["version"] != CACHE_VERSION:
+                raise ValueError("Outdated cache entry")
+
+            primitives = []
+            for primitive_metadata in metadata["primitives"]:
+                primitive = dict(primitive_metadata["values"])
+                for name, filename in primitive_metadata["arrays"].items():
+                    primitive[name] = self.__load_array(entry_directory, filename)
+                primitive["attributes"] = {
+                    name: self.__load_array(entry_directory, filename)
+                    for name, filename in primitive_metadata["attributes"].items()
+                }
+                primitives.append(primitive)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__used_keys.add(key)
+        return primitives
+
+    def store(self, key, primitives):
+        """
+        Stores the primitives for key. Failing to write the cache is not an error, the export just continues without it.
+
+        :param primitives: a list of primitives in the format of extract_primitives
+        """
+        self.__used_keys.add(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write into a temporary directory first, so an interrupted export never leaves an incomplete entry behind
+            temporary_directory = tempfile.mkdtemp(prefix=".", dir=self.directory)
+        except OSError as e:
+            print_console("WARNING", "Could not write the geometry cache: " + str(e))
+            return
+
+        try:
+            metadata = {"version": CACHE_VERSION, "primitives": []}
+            for i, primitive in enumerate(primitives):
+                primitive_metadata = {"values": {}, "arrays": {}, "attributes": {}}
+                for name, value in primitive.items():
+                    if name == "attributes":
+                        for attribute_name, array in value.items():
+                            primitive_metadata["attributes"][attribute_name] = (
+                                self.__save_array(
+                                    temporary_directory,
+                                    "%d_%s" % (i, attribute_name),
+                                    array,
+                                )
+                            )
+                    elif isinstance(value, np.ndarray):
+                        primitive_metadata["arrays"][name] = self.__save_array(
+                            temporary_directory, "%d_%s" % (i, name), value
+                        )
+                    elif isinstance(value, np.generic):
+                        primitive_metadata["values"][name] = value.item()
+                    else:
+                        primitive_metadata["values"][name] = value
+                metadata["primitives"].append(primitive_metadata)
+
+            with open(os.path.join(temporary_directory, METADATA_FILENAME), "w") as f:
+                json.dump(metadata, f)
+
+            entry_directory = os.path.join(self.directory, key)
+            if os.path.isdir(entry_directory):
+                shutil.rmtree(entry_directory)
+            os.replace(temporary_directory, entry_directory)
+        except (OSError, TypeError) as e:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+            print_console("WARNING", "Could not write the geometry cache: " + str(e))
+
+    def prune(self):
+        """Removes all entries that weren't loaded or stored since this cache was created."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name not in self.__used_keys:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    @staticmethod
+    def __save_array(directory, name, array):
+        filename = name + ".npy"
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(array))
+        return filename
+
+    @staticmethod
+    def __load_array(directory, filename):
+        # Plain ndarrays instead of memmaps, since some of the export checks for exact ndarrays
+        return np.asarray(np.load(os.path.join(directory, filename), mmap_mode="c"))
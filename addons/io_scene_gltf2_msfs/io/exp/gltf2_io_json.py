@@ -0,0 +1,238 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Imports
+#
+
+from json.encoder import encode_basestring_ascii
+
+#
+# Globals
+#
+
+ROOT_KEY_ORDER = [
+    "accessors",
+    "animations",
+    "asset",
+    "bufferViews",
+    "extensionsUsed",
+    "extensionsRequired",
+    "extensions",
+    "extras",
+    "materials",
+    "meshes",
+    "nodes",
+    "scene",
+    "scenes",
+    "skins",
+    "textures",
+    "buffers",
+    "images",
+    "cameras",
+    "samplers",
+]
+
+ALLOWED_EMPTY_COLLECTIONS = ["KHR_materials_unlit"]
+
+FLUSH_PART_COUNT = 8192  # Amount of encoded parts that are joined and written at once
+
+#
+# Functions
+#
+
+
+def write_gltf_json(gltf, write, indent, separators, default):
+    """
+    Encodes the dict of a glTF as JSON and writes it in parts, without building the whole document in memory.
+
+    While encoding, None values and empty collections are left out of dicts, integral floats are written as ints, and the root keys are
+    written in the order of ROOT_KEY_ORDER. Everything else is written like json.dumps(..., allow_nan=False) would. Values that aren't
+    dicts or lists, like tuples or the results of default, are written as they are.
+
+    :param gltf: the glTF as returned by Gltf.to_dict
+    :param write: called with every encoded part of the document
+    :param indent: the amount of spaces to indent with, or None for a compact document
+    :param separators: the (item_separator, key_separator) tuple, like for json.dumps
+    :param default: called for values that can't be encoded, and returns an encodable value, like JSONEncoder.default
+    """
+    item_separator, key_separator = separators
+    indent = None if indent is None else " " * indent
+
+    parts = []
+    append = parts.append
+
+    def encode(value, level, fix):
+        if isinstance(value, str):
+            append(encode_basestring_ascii(value))
+        elif value is None:
+            append("null")
+        elif value is True:
+            append("true")
+        elif value is False:
+            append("false")
+        elif isinstance(value, int):
+            append(int.__repr__(value))
+        elif isinstance(value, float):
+            encode_float(value, fix)
+        elif isinstance(value, list):
+            encode_list(value, level, fix)
+        elif isinstance(value, tuple):
+            encode_list(value, level, False)
+        elif isinstance(value, dict):
+            items = value.items()
+            if fix:
+                items = [
+                    item
+                    for item in items
+                    if __should_include_json_value(item[0], item[1])
+                ]
+            encode_dict(items, level, fix)
+        else:
+            encode(default(value), level, False)
+
+    def encode_float(value, fix):
+        # force floats to int, if they are integers (prevent INTEGER_WRITTEN_AS_FLOAT validator warnings)
+        if fix and int(value) == value:
+            append(int.__repr__(int(value)))
+        else:
+            append(__encode_float(value))
+
+    def encode_item(value, level, fix):
+        # Fast path for the most common values
+        value_type = type(value)
+        if value_type is str:
+            append(encode_basestring_ascii(value))
+        elif value_type is int:
+            append(int.__repr__(value))
+        elif value_type is float:
+            encode_float(value, fix)
+        else:
+            encode(value, level, fix)
+
+    def flush():
+        if len(parts) >= FLUSH_PART_COUNT:
+            write("".join(parts))
+            parts.clear()
+
+    def encode_list(values, level, fix):
+        if not values:
+            append("[]")
+            return
+
+        if indent is None:
+            newline_indent = None
+            separator = item_separator
+            append("[")
+        else:
+            level += 1
+            newline_indent = "\n" + indent * level
+            separator = item_separator + newline_indent
+            append("[" + newline_indent)
+
+        first = True
+        for value in values:
+            if first:
+                first = False
+            else:
+                append(separator)
+            encode_item(value, level, fix)
+
+        if newline_indent is not None:
+            append("\n" + indent * (level - 1))
+        append("]")
+        flush()
+
+    def encode_dict(items, level, fix):
+        if not items:
+            append("{}")
+            return
+
+        if indent is None:
+            newline_indent = None
+            separator = item_separator
+            append("{")
+        else:
+            level += 1
+            newline_indent = "\n" + indent * level
+            separator = item_separator + newline_indent
+            append("{" + newline_indent)
+
+        first = True
+        for key, value in items:
+            if first:
+                first = False
+            else:
+                append(separator)
+            append(__encode_key(key) + key_separator)
+            encode_item(value, level, fix)
+
+        if newline_indent is not None:
+            append("\n" + indent * (level - 1))
+        append("}")
+        flush()
+
+    root_items = sorted(
+        (
+            item
+            for item in gltf.items()
+            if __should_include_json_value(item[0], item[1])
+        ),
+        key=lambda item: ROOT_KEY_ORDER.index(item[0]),
+    )
+    encode_dict(root_items, 0, True)
+
+    if parts:
+        write("".join(parts))
+
+
+def __should_include_json_value(key, value):
+    if value is None:
+        return False
+    elif __is_empty_collection(value) and key not in ALLOWED_EMPTY_COLLECTIONS:
+        return False
+    return True
+
+
+def __is_empty_collection(value):
+    return (isinstance(value, dict) or isinstance(value, list)) and len(value) == 0
+
+
+def __encode_float(value):
+    if value != value or value in (float("inf"), float("-inf")):
+        raise ValueError(
+            "Out of range float values are not JSON compliant: " + repr(value)
+        )
+    return float.__repr__(value)
+
+
+def __encode_key(key):
+    # Same conversions as the json module
+    if isinstance(key, str):
+        pass
+    elif isinstance(key, float):
+        key = __encode_float(key)
+    elif key is True:
+        key = "true"
+    elif key is False:
+        key = "false"
+    elif key is None:
+        key = "null"
+    elif isinstance(key, int):
+        key = int.__repr__(key)
+    else:
+        raise TypeError(
+            "keys must be str, int, float, bool or None, not " + key.__class__.__name__
+        )
+    return encode_basestring_ascii(key)
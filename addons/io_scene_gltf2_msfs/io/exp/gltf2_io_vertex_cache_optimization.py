@@ -0,0 +1,223 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from io_scene_gltf2_msfs.io.com.gltf2_io_debug import print_console
+
+CACHE_SIZE = 16  # Size of the simulated post-transform vertex cache. 16 is a safe lower bound for current GPUs
+
+
+def optimize_scene_primitives(scenes, export_settings):
+    """
+    Reorders the triangles of every triangle primitive for post-transform vertex cache locality, then renumbers the vertices in the order they are
+    first used, for vertex fetch locality.
+
+    This has to run before the primitives are packed into the Asobo buffer views, so that splitting and the BaseVertexIndex/StartIndex bookkeeping
+    are done on the optimized indices.
+    """
+    # Don't optimize the same primitive multiple times. Primitives can be shared across meshes.
+    optimized_primitives = set()
+
+    total_triangles = 0
+    total_misses_before = 0
+    total_misses_after = 0
+
+    for scene in scenes:
+        for node in scene.nodes:
+            for primitive in __traverse_node_primitives(node):
+                if id(primitive.indices) in optimized_primitives:
+                    continue
+                optimized_primitives.add(id(primitive.indices))
+
+                triangles, misses_before, misses_after = __optimize_primitive(primitive)
+                total_triangles += triangles
+                total_misses_before += misses_before
+                total_misses_after += misses_after
+
+    if total_triangles > 0:
+        print_console(
+            "INFO",
+            "Vertex cache optimization: ACMR {:.3f} -> {:.3f} ({} triangles, cache size {})".format(
+                total_misses_before / total_triangles,
+                total_misses_after / total_triangles,
+                total_triangles,
+                CACHE_SIZE,
+            ),
+        )
+
+
+def __traverse_node_primitives(node):
+    if node.mesh is not None:
+        yield from node.mesh.primitives
+    if node.children is not None:
+        for child in node.children:
+            yield from __traverse_node_primitives(child)
+
+
+def __optimize_primitive(primitive):
+    if primitive.indices is None or primitive.mode not in (None, 4):
+        return 0, 0, 0
+
+    indices = np.asarray(primitive.indices.buffer_view)
+    if len(indices) < 3:
+        return 0, 0, 0
+
+    vertex_count = primitive.attributes["POSITION"].count
+
+    misses_before = calculate_cache_misses(indices, CACHE_SIZE)
+
+    indices = tipsify(indices, vertex_count, CACHE_SIZE)
+    indices, vertex_order = reorder_vertices(indices, vertex_count)
+
+    # Move the vertex data into first-use order
+    for attribute in primitive.attributes.values():
+        attribute.buffer_view = np.asarray(attribute.buffer_view)[vertex_order]
+
+    primitive.indices.buffer_view = indices.astype(
+        primitive.indices.buffer_view.dtype, copy=False
+    )
+
+    misses_after = calculate_cache_misses(indices, CACHE_SIZE)
+
+    return len(indices) // 3, misses_before, misses_after
+
+
+def calculate_cache_misses(indices, cache_size):
+    """
+    Counts the vertex transforms needed to draw a triangle list through a FIFO post-transform vertex cache.
+    Dividing the result by the triangle count gives the ACMR (average cache miss ratio).
+
+    :param indices: a numpy array of triangle indices
+    :param cache_size: the amount of vertices the cache holds
+    :return: the amount of cache misses
+    """
+    cache_time = {}
+    time_stamp = 0
+    misses = 0
+    for v in indices.tolist():
+        # A vertex is in a FIFO cache if less than cache_size vertices were added since it was added
+        if time_stamp - cache_time.get(v, -cache_size - 1) > cache_size:
+            cache_time[v] = time_stamp
+            time_stamp += 1
+            misses += 1
+    return misses
+
+
+def tipsify(indices, vertex_count, cache_size):
+    """
+    Reorders triangles for vertex cache locality, using the Tipsify algorithm from
+    "Fast Triangle Reordering for Vertex Locality and Reduced Overdraw" (Sander, Nehab and Barczak, 2007).
+
+    Triangles are emitted in fans around a "fanning" vertex. The next fanning vertex is picked among the vertices of the last fan, preferring vertices
+    that are still in the cache and have few remaining triangles.
+
+    :param indices: a numpy array of triangle indices
+    :param vertex_count: the amount of vertices referenced by indices
+    :param cache_size: the amount of vertices the cache holds
+    :return: a numpy array with the reordered triangle indices
+    """
+    triangles = indices.reshape(-1, 3)
+    triangle_count = len(triangles)
+
+    # Build vertex -> triangle adjacency in CSR form
+    flat_vertices = triangles.reshape(-1).astype(np.int64)
+    live = np.bincount(flat_vertices, minlength=vertex_count)
+    adjacency_offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(live, out=adjacency_offsets[1:])
+    adjacency = np.repeat(np.arange(triangle_count), 3)[
+        np.argsort(flat_vertices, kind="stable")
+    ]
+
+    adjacency_offsets = adjacency_offsets.tolist()
+    adjacency = adjacency.tolist()
+    live = live.tolist()
+    triangle_list = triangles.tolist()
+
+    cache_time = [-cache_size - 1] * vertex_count
+    emitted = [False] * triangle_count
+    dead_end = []
+    time_stamp = cache_size + 1
+    cursor = 0
+    output = []
+
+    fanning_vertex = 0 if vertex_count > 0 else -1
+    while fanning_vertex >= 0:
+        candidates = []
+        for t in adjacency[
+            adjacency_offsets[fanning_vertex] : adjacency_offsets[fanning_vertex + 1]
+        ]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            output.append(t)
+            for v in triangle_list[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time_stamp - cache_time[v] > cache_size:
+                    cache_time[v] = time_stamp
+                    time_stamp += 1
+
+        # Pick the next fanning vertex among the candidates
+        fanning_vertex = -1
+        best_priority = -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                # Prefer vertices that will still be in the cache after emitting their remaining triangles
+                if time_stamp - cache_time[v] + 2 * live[v] <= cache_size:
+                    priority = time_stamp - cache_time[v]
+                if priority > best_priority:
+                    best_priority = priority
+                    fanning_vertex = v
+
+        if fanning_vertex == -1:
+            # Dead end, go back to the most recently used vertex that still has triangles left
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning_vertex = v
+                    break
+
+        if fanning_vertex == -1:
+            # Nothing nearby, continue with the next vertex in input order
+            while cursor < vertex_count:
+                if live[cursor] > 0:
+                    fanning_vertex = cursor
+                    break
+                cursor += 1
+
+    return triangles[np.array(output, dtype=np.int64)].reshape(-1)
+
+
+def reorder_vertices(indices, vertex_count):
+    """
+    Renumbers vertices in the order they are first used by the indices. Vertices that are never used are moved to the end.
+
+    :param indices: a numpy array of triangle indices
+    :param vertex_count: the amount of vertices
+    :return (indices, vertex_order): the renumbered indices, and the old index of every new vertex
+    """
+    unique_vertices, first_use = np.unique(indices, return_index=True)
+    used_vertices = unique_vertices[np.argsort(first_use, kind="stable")]
+
+    unused = np.ones(vertex_count, dtype=bool)
+    unused[used_vertices] = False
+    vertex_order = np.concatenate((used_vertices, np.flatnonzero(unused)))
+
+    new_index = np.empty(vertex_count, dtype=np.int64)
+    new_index[vertex_order] = np.arange(vertex_count)
+
+    return new_index[indices], vertex_order
@@ -0,0 +1,456 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks the io layer of the exporter and importer without Blender.
+
+Synthetic Asobo primitives are packed with AsoboBufferViews, merged into a glTF Buffer, written to a .glb with save_gltf and read back with
+BinaryData.decode_accessor. Every stage is timed, and its peak memory is recorded.
+
+Usage:
+    python tests/benchmark/benchmark_io.py --output report.json
+    python tests/benchmark/benchmark_io.py --baseline report.json --threshold 1.25
+
+When a baseline report is given, the script exits with a non-zero status if any stage got slower than the baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+ADDONS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "addons")
+
+# The package's __init__ registers the Blender operators, so it can't be imported without bpy. The io layer doesn't depend on it, so we only
+# register the package path and import the io modules directly.
+if "io_scene_gltf2_msfs" not in sys.modules:
+    package = types.ModuleType("io_scene_gltf2_msfs")
+    package.__path__ = [os.path.join(ADDONS_PATH, "io_scene_gltf2_msfs")]
+    sys.modules["io_scene_gltf2_msfs"] = package
+
+from io_scene_gltf2_msfs.io.com import gltf2_io
+from io_scene_gltf2_msfs.io.com import gltf2_io_constants
+from io_scene_gltf2_msfs.io.com import gltf2_io_debug
+from io_scene_gltf2_msfs.io.exp import gltf2_io_asobo_buffer_views
+from io_scene_gltf2_msfs.io.exp import gltf2_io_buffer
+from io_scene_gltf2_msfs.io.exp import gltf2_io_export
+from io_scene_gltf2_msfs.io.imp.gltf2_io_binary import BinaryData
+from io_scene_gltf2_msfs.io.imp.gltf2_io_gltf import glTFImporter
+
+LAYOUTS = ["VTX", "BLEND1", "BLEND4"]
+STAGES = ["traverse_scenes", "buffer", "save_gltf", "decode_accessor"]
+
+# Vertex count of the primitives in the cases that don't need 16-bit splitting
+UNSPLIT_PRIMITIVE_VERTICES = 60000
+
+# Stages faster than this are too noisy to be compared against a baseline
+MIN_COMPARED_SECONDS = 0.01
+
+
+#
+# Synthetic data
+#
+
+
+def create_accessor(array, component_type, data_type, include_max_and_min=False):
+    return gltf2_io.Accessor(
+        buffer_view=array,
+        byte_offset=None,
+        component_type=component_type,
+        count=len(array),
+        extensions=None,
+        extras=None,
+        max=np.amax(array, axis=0).tolist() if include_max_and_min else None,
+        min=np.amin(array, axis=0).tolist() if include_max_and_min else None,
+        name=None,
+        normalized=None,
+        sparse=None,
+        type=data_type,
+    )
+
+
+def create_primitive(rng, layout, vertex_count):
+    """Creates a primitive with the attributes that gather_primitive_attributes produces for the given Asobo vertex type."""
+    ComponentType = gltf2_io_constants.ComponentType
+    DataType = gltf2_io_constants.DataType
+
+    attributes = {
+        "POSITION": create_accessor(
+            rng.standard_normal((vertex_count, 3), dtype=np.float32),
+            ComponentType.Float,
+            DataType.Vec3,
+            include_max_and_min=True,
+        ),
+        "NORMAL": create_accessor(
+            rng.integers(-127, 128, (vertex_count, 4), dtype=np.int8),
+            ComponentType.Byte,
+            DataType.Vec4,
+        ),
+        "TANGENT": create_accessor(
+            rng.integers(-127, 128, (vertex_count, 4), dtype=np.int8),
+            ComponentType.Byte,
+            DataType.Vec4,
+        ),
+        "TEXCOORD_0": create_accessor(
+            rng.random((vertex_count, 2)).astype(np.float16),
+            ComponentType.Short,
+            DataType.Vec2,
+        ),
+        "TEXCOORD_1": create_accessor(
+            rng.random((vertex_count, 2)).astype(np.float16),
+            ComponentType.Short,
+            DataType.Vec2,
+        ),
+    }
+    if layout == "VTX":
+        attributes["COLOR_0"] = create_accessor(
+            np.full((vertex_count, 4), 15360, dtype=np.uint16),
+            ComponentType.UnsignedShort,
+            DataType.Vec4,
+        )
+    else:
+        attributes["COLOR_0"] = create_accessor(
+            np.full((vertex_count, 4), -1, dtype=np.int8),
+            ComponentType.Byte,
+            DataType.Vec4,
+        )
+        attributes["JOINTS_0"] = create_accessor(
+            rng.integers(0, 64, (vertex_count, 4), dtype=np.uint8),
+            ComponentType.UnsignedByte,
+            DataType.Vec4,
+        )
+        if layout == "BLEND4":
+            attributes["WEIGHTS_0"] = create_accessor(
+                rng.integers(0, 65536, (vertex_count, 4), dtype=np.uint16),
+                ComponentType.UnsignedShort,
+                DataType.Vec4,
+            )
+        else:
+            attributes["WEIGHTS_0"] = create_accessor(
+                np.ones((vertex_count, 1), dtype=np.float32),
+                ComponentType.Float,
+                DataType.Scalar,
+            )
+
+    # A triangle strip over the vertices, so that the triangles are local like in a real mesh
+    first = np.arange(vertex_count - 2)
+    triangles = np.stack((first, first + 1, first + 2), axis=1)
+    triangles[1::2] = triangles[1::2, ::-1]
+    index_dtype = np.uint16 if vertex_count <= 65535 else np.uint32
+    indices = create_accessor(
+        triangles.reshape(-1).astype(index_dtype),
+        (
+            ComponentType.UnsignedShort
+            if index_dtype == np.uint16
+            else ComponentType.UnsignedInt
+        ),
+        DataType.Scalar,
+    )
+
+    return gltf2_io.MeshPrimitive(
+        attributes=attributes,
+        extensions=None,
+        extras={
+            "ASOBO_primitive": {
+                "BaseVertexIndex": None,
+                "PrimitiveCount": len(triangles),
+                "StartIndex": None,
+                "VertexType": layout,
+                "VertexVersion": 2,
+            }
+        },
+        indices=indices,
+        material=None,
+        mode=4,
+        targets=None,
+    )
+
+
+def create_scenes(layout, vertex_count, split, seed=0):
+    """
+    Creates a scene with vertex_count vertices in total. If split is True, all vertices are in a single primitive that has to be split into 16-bit
+    chunks. Otherwise, every mesh is small enough to not need splitting.
+    """
+    rng = np.random.default_rng(seed)
+
+    if split:
+        mesh_vertex_counts = [vertex_count]
+    else:
+        mesh_vertex_counts = [UNSPLIT_PRIMITIVE_VERTICES] * (
+            vertex_count // UNSPLIT_PRIMITIVE_VERTICES
+        )
+        if vertex_count % UNSPLIT_PRIMITIVE_VERTICES >= 3:
+            mesh_vertex_counts.append(vertex_count % UNSPLIT_PRIMITIVE_VERTICES)
+
+    nodes = []
+    for i, mesh_vertex_count in enumerate(mesh_vertex_counts):
+        mesh = gltf2_io.Mesh(
+            extensions=None,
+            extras=None,
+            name="Mesh_{}".format(i),
+            primitives=[create_primitive(rng, layout, mesh_vertex_count)],
+            weights=None,
+        )
+        nodes.append(
+            gltf2_io.Node(
+                camera=None,
+                children=None,
+                extensions=None,
+                extras=None,
+                matrix=None,
+                mesh=mesh,
+                name="Node_{}".format(i),
+                rotation=None,
+                scale=None,
+                skin=None,
+                translation=None,
+                weights=None,
+            )
+        )
+
+    return [gltf2_io.Scene(extensions=None, extras=None, name="Scene", nodes=nodes)]
+
+
+def scenes_to_dict(scenes, buffer_views, byte_length):
+    """Converts packed scenes to a glTF dictionary, replacing object references with indices like GlTF2Exporter does."""
+    accessors = []
+    accessor_indices = {}
+
+    def accessor_index(accessor):
+        if id(accessor) not in accessor_indices:
+            accessor_indices[id(accessor)] = len(accessors)
+            accessors.append(accessor.to_dict())
+        return accessor_indices[id(accessor)]
+
+    meshes = []
+    nodes = []
+    for node in scenes[0].nodes:
+        primitives = []
+        for primitive in node.mesh.primitives:
+            primitives.append(
+                {
+                    "attributes": {
+                        name: accessor_index(accessor)
+                        for name, accessor in primitive.attributes.items()
+                    },
+                    "extras": primitive.extras,
+                    "indices": accessor_index(primitive.indices),
+                    "mode": primitive.mode,
+                }
+            )
+        nodes.append({"mesh": len(meshes), "name": node.name})
+        meshes.append({"name": node.mesh.name, "primitives": primitives})
+
+    return {
+        "accessors": accessors,
+        "asset": {"version": "2.0"},
+        "bufferViews": [buffer_view.to_dict() for buffer_view in buffer_views],
+        "meshes": meshes,
+        "nodes": nodes,
+        "scene": 0,
+        "scenes": [{"nodes": list(range(len(nodes)))}],
+        "buffers": [{"byteLength": byte_length}],
+    }
+
+
+#
+# Stages
+#
+
+
+def run_stages(layout, vertex_count, split, directory):
+    """Runs all stages once on a fresh scene. Returns the duration of every stage, and the stage results."""
+    scenes = create_scenes(layout, vertex_count, split)
+    durations = {}
+    results = {}
+
+    start = time.perf_counter()
+    asobo_buffer_views = gltf2_io_asobo_buffer_views.AsoboBufferViews()
+    asobo_buffer_views.traverse_scenes(scenes)
+    durations["traverse_scenes"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = gltf2_io_buffer.Buffer()
+    gltf2_io_asobo_buffer_views.AsoboBufferViews.move_to_buffer(
+        asobo_buffer_views.BufferViews, buffer
+    )
+    durations["buffer"] = time.perf_counter() - start
+
+    gltf = scenes_to_dict(scenes, asobo_buffer_views.BufferViews, buffer.byte_length)
+    filepath = os.path.join(directory, "{}.glb".format(layout))
+    export_settings = {"gltf_format": "GLB", "gltf_filepath": filepath}
+
+    start = time.perf_counter()
+    gltf2_io_export.save_gltf(gltf, export_settings, json.JSONEncoder, buffer.chunks)
+    durations["save_gltf"] = time.perf_counter() - start
+    del buffer
+
+    start = time.perf_counter()
+    importer = glTFImporter(filepath, {}, {})
+    importer.read()
+    decoded_bytes = 0
+    for accessor_index in range(len(importer.data.accessors)):
+        decoded_bytes += BinaryData.decode_accessor(
+            importer, accessor_index, is_asobo_optimized=True
+        ).nbytes
+    durations["decode_accessor"] = time.perf_counter() - start
+
+    results["file_bytes"] = os.path.getsize(filepath)
+    results["decoded_bytes"] = decoded_bytes
+
+    return durations, results
+
+
+def measure_peak_memory(layout, vertex_count, split, directory):
+    """Runs the stages once with tracemalloc enabled, and returns the peak memory of the whole run. numpy reports its allocations to tracemalloc."""
+    tracemalloc.start()
+    try:
+        run_stages(layout, vertex_count, split, directory)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(layout, vertex_count, split, repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        timings = {stage: [] for stage in STAGES}
+        for _ in range(repeat):
+            durations, results = run_stages(layout, vertex_count, split, directory)
+            for stage in STAGES:
+                timings[stage].append(durations[stage])
+
+        peak_memory = measure_peak_memory(layout, vertex_count, split, directory)
+
+    return {
+        "layout": layout,
+        "vertices": vertex_count,
+        "split": split,
+        # The minimum is the least noisy estimate of the real cost of a stage
+        "seconds": {stage: min(timings[stage]) for stage in STAGES},
+        "peak_memory_bytes": peak_memory,
+        **results,
+    }
+
+
+#
+# Report
+#
+
+
+def compare_to_baseline(report, baseline, threshold):
+    """Returns a list of messages, one for every stage that is slower than the baseline by more than the threshold."""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in report["cases"]:
+        baseline_case = baseline_cases.get(case["name"])
+        if baseline_case is None:
+            continue
+        for stage, seconds in case["seconds"].items():
+            baseline_seconds = baseline_case["seconds"].get(stage)
+            if baseline_seconds is None or seconds < MIN_COMPARED_SECONDS:
+                continue
+            if seconds > baseline_seconds * threshold:
+                regressions.append(
+                    "{} {}: {:.3f}s, baseline {:.3f}s ({:.2f}x)".format(
+                        case["name"],
+                        stage,
+                        seconds,
+                        baseline_seconds,
+                        seconds / baseline_seconds,
+                    )
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--vertices",
+        type=int,
+        nargs="+",
+        default=[100000, 1000000],
+        help="Vertex counts to benchmark, up to 10M",
+    )
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=LAYOUTS)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Amount of timed runs per case"
+    )
+    parser.add_argument("--output", help="Path of the JSON report")
+    parser.add_argument("--baseline", help="Path of a JSON report to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Fail if a stage takes longer than the baseline times this factor",
+    )
+    args = parser.parse_args(argv)
+
+    if max(args.vertices) > 10000000:
+        parser.error("vertex counts over 10M are not supported")
+
+    gltf2_io_debug.set_output_level("WARNING")
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cases": [],
+    }
+    for vertex_count in args.vertices:
+        for layout in args.layouts:
+            for split in (False, True):
+                if split and vertex_count <= gltf2_io_asobo_buffer_views.SPLIT_INDEX:
+                    continue  # Nothing to split
+                case = run_case(layout, vertex_count, split, args.repeat)
+                case["name"] = "{}_{}_{}".format(
+                    layout, vertex_count, "split" if split else "unsplit"
+                )
+                report["cases"].append(case)
+                print(
+                    "{:<28} {}  peak {:.1f} MiB".format(
+                        case["name"],
+                        "  ".join(
+                            "{} {:.3f}s".format(stage, seconds)
+                            for stage, seconds in case["seconds"].items()
+                        ),
+                        case["peak_memory_bytes"] / (1024 * 1024),
+                    )
+                )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        if regressions:
+            print("Performance regressions:")
+            for regression in regressions:
+                print("    " + regression)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
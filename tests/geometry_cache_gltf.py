@@ -0,0 +1,66 @@
+# Copyright 2021 FlyByWire Simulations.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bpy
+import os
+import shutil
+import sys
+
+try:
+    argv = sys.argv
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1 :]  # get all args after "--"
+    else:
+        argv = []
+
+    output_dir = argv[0]
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    bpy.ops.object.select_all(action="SELECT")
+    bpy.ops.object.delete(use_global=False)
+
+    # A mesh with two UV maps that give different tangents
+    bpy.ops.mesh.primitive_uv_sphere_add()
+    bpy.ops.object.shade_smooth()
+    mesh = bpy.context.object.data
+    rotated_uv_layer = mesh.uv_layers.new(name="Rotated")
+    for uv_loop in rotated_uv_layer.data:
+        uv_loop.uv = (uv_loop.uv[1], uv_loop.uv[0])
+    mesh.uv_layers.active_index = 0
+
+    def export(filename, geometry_cache):
+        bpy.ops.export_scene.gltf_msfs(
+            export_format="GLTF_SEPARATE",
+            filepath=os.path.join(output_dir, filename),
+            export_tangents=True,
+            export_geometry_cache=geometry_cache,
+            emulate_asobo_optimization=False,
+        )
+
+    cache_directory = os.path.join(output_dir, "12_geometry_cache.geometry_cache")
+    if os.path.exists(cache_directory):
+        shutil.rmtree(cache_directory)
+
+    # Fill the cache, then change only the active UV map. The next export must not reuse the tangents of the first UV map, and the export
+    # after it must reuse the ones of the second UV map
+    export("12_geometry_cache.gltf", True)
+    mesh.uv_layers.active_index = 1
+    export("12_geometry_cache.gltf", True)
+    export("12_geometry_cache.gltf", True)
+
+    export("12_geometry_cache_uncached.gltf", False)
+except Exception as err:
+    print(err, file=sys.stderr)
+    sys.exit(1)
@@ -64,6 +64,20 @@ function blenderRoundtripGltf(blenderVersion, gltfPath, outDirName, done, option
     });
 }
 
+function blenderGeometryCacheGltf(blenderVersion, outDirName, done) {
+    const { exec } = require('child_process');
+    const cmd = `${blenderVersion} -b --addons io_scene_gltf2_msfs -noaudio --python geometry_cache_gltf.py -- ${outDirName}`;
+    var prc = exec(cmd, (error, stdout, stderr) => {
+        //if (stderr) process.stderr.write(stderr);
+
+        if (error) {
+            done(error);
+            return;
+        }
+        done();
+    });
+}
+
 function validateGltf(gltfPath, done) {
     const asset = fs.readFileSync(gltfPath);
     validator.validateBytes(new Uint8Array(asset), {
@@ -158,6 +172,9 @@ function getAccessorData(gltfPath, asset, accessorIndex, bufferCache) {
     case 'VEC3':
         numElements = 3;
         break;
+    case 'VEC4':
+        numElements = 4;
+        break;
     default:
         throw new Error("Untested accessor type " + accessor.type);
     }
@@ -740,6 +757,36 @@ describe('Exporter', function() {
     });
 });
 
+describe('Geometry cache', function() {
+    blenderVersions.forEach(function(blenderVersion) {
+        describe(blenderVersion + '_geometry_cache', function() {
+            let outDirName = 'out' + blenderVersion;
+            let outDirPath = path.resolve(OUT_PREFIX, 'geometry_cache', outDirName);
+
+            before(function(done) {
+                blenderGeometryCacheGltf(blenderVersion, outDirPath, done);
+            });
+
+            it('exports the tangents of the active UV map from the cache', function() {
+                let cachedPath = path.resolve(outDirPath, '12_geometry_cache.gltf');
+                let uncachedPath = path.resolve(outDirPath, '12_geometry_cache_uncached.gltf');
+                const cachedAsset = JSON.parse(fs.readFileSync(cachedPath));
+                const uncachedAsset = JSON.parse(fs.readFileSync(uncachedPath));
+
+                const cachedPrims = cachedAsset.meshes[0].primitives;
+                const uncachedPrims = uncachedAsset.meshes[0].primitives;
+                assert.strictEqual(cachedPrims.length, uncachedPrims.length);
+
+                for (let i = 0; i < cachedPrims.length; ++i) {
+                    const cachedTangents = getAccessorData(cachedPath, cachedAsset, cachedPrims[i].attributes.TANGENT, {});
+                    const uncachedTangents = getAccessorData(uncachedPath, uncachedAsset, uncachedPrims[i].attributes.TANGENT, {});
+                    assert.equalEpsilonArray(cachedTangents, uncachedTangents);
+                }
+            });
+        });
+    });
+});
+
 describe('Importer / Exporter (Roundtrip)', function() {
     blenderVersions.forEach(function(blenderVersion) {
         let variants = [